@@ -58,6 +58,8 @@ setup(
     # -*- Entry points: -*-
     [z3c.autoinclude.plugin]
     target = plone
+    [console_scripts]
+    uu-formlibrary-evaluate = uu.formlibrary.measure.evaluate:main
     """,
     )
 
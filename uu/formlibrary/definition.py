@@ -4,9 +4,7 @@ from persistent import Persistent
 from persistent.list import PersistentList
 from plone.dexterity.content import Container, Item, DexterityContent
 from plone.schemaeditor.browser.schema.traversal import SchemaContext
-from Products.CMFCore.utils import getToolByName
 from zope.component import adapts
-from zope.component.hooks import getSite
 from zope.interface import implements
 
 from uu.dynamicschema.schema import SignatureSchemaContext
@@ -15,6 +13,7 @@ from uu.dynamicschema.schema import copy_schema
 from uu.formlibrary.interfaces import IFormDefinition, IFieldGroup
 from uu.formlibrary.interfaces import DEFINITION_TYPE, FIELD_GROUP_TYPE
 from uu.formlibrary.interfaces import IDefinitionHistory, IFormComponents
+from uu.formlibrary.utils import resolve_uids
 
 
 itemkeys = lambda seq: zip(*seq)[0] if seq else []  # unzip items tuple
@@ -25,13 +24,11 @@ def form_definition(context, attr='definition'):
     def_uid = getattr(context, attr, None)
     if def_uid is None:
         raise ValueError('context lacks %s identifier' % attr)
-    site = getSite()
-    catalog = getToolByName(site, 'portal_catalog')
-    find = catalog.unrestrictedSearchResults
-    r = find({'UID': def_uid, 'portal_type': DEFINITION_TYPE})
-    if not r:
+    # many forms share a definition, so lookup is memoized for request:
+    r = resolve_uids([def_uid], memo=True).get(str(def_uid))
+    if r is None or getattr(r, 'portal_type', None) != DEFINITION_TYPE:
         raise ValueError('could not locate form definition')
-    return r[0]._unrestrictedGetObject()
+    return r
 
 
 class DefinitionHistory(Persistent):
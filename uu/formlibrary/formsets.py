@@ -8,6 +8,7 @@ from Products.CMFCore.utils import getToolByName
 
 from uu.formlibrary.interfaces import IFormSet, IFormDefinition
 from uu.formlibrary.interfaces import MULTI_FORM_TYPE, SIMPLE_FORM_TYPE
+from uu.formlibrary.utils import resolve_uids
 
 
 # form set adapters:
@@ -28,12 +29,9 @@ class BaseFormSet(object):
         self.context = context
 
     def get(self, key, default=None):
-        if key not in self.keys():
+        if key not in self.contents:
             return default
-        r = self.catalog.unrestrictedSearchResults({'UID': str(key)})
-        if not r:
-            return default
-        return r[0]._unrestrictedGetObject()
+        return resolve_uids([key], self.site, memo=True).get(str(key), default)
 
     def __getitem__(self, key):
         v = self.get(key)
@@ -58,12 +56,16 @@ class BaseFormSet(object):
 
     __iter__ = iterkeys
 
-    def itervalues(self):
-        return itertools.imap(self.__getitem__, self.keys())
-
     def iteritems(self):
-        itemtuple = lambda k: (k, self[k])
-        return itertools.imap(itemtuple, self.keys())
+        # resolve all values using one query, not one query per key:
+        resolved = resolve_uids(self.contents, self.site, memo=True)
+        for key in self.keys():
+            if str(key) not in resolved:
+                self[key]  # raises KeyError, as for any unlocatable value
+            yield (key, resolved[str(key)])
+
+    def itervalues(self):
+        return itertools.imap(lambda item: item[1], self.iteritems())
 
     def values(self):
         return list(self.itervalues())
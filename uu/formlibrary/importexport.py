@@ -7,6 +7,7 @@ from zope.schema import getFieldsInOrder
 from zope.schema.interfaces import IDate, IDatetime
 
 from uu.formlibrary.interfaces import IMultiForm, ICSVColumn, IMultiFormCSV
+from uu.formlibrary.snapshot import record_values
 
 
 _str = lambda v: v.encode('utf-8') if isinstance(v, unicode) else str(v)
@@ -19,9 +20,10 @@ def multi_column_fields(fields, form):
     form, be more for a List (multiple choice) field.
     """
     selected = {}
+    records = record_values(form)
     for name, field in fields:
         selected[name] = set()
-        for record in form.values():
+        for record in records:
             val = getattr(record, name, None)
             if type(val) in (list, tuple, set):
                 selected[name].update(val)
@@ -145,7 +147,7 @@ def csv_export(form, schema=None):
     # write next row: column titles
     writer.writerow(dict([(name, col.title.encode('utf-8'))
                           for name, col in colspec]))
-    for record in form.values():
+    for record in record_values(form):
         record_dict = {}
         for name, col in colspec:
             record_dict[name] = col.get(record)
@@ -0,0 +1,131 @@
+from datetime import timedelta
+import heapq
+import operator
+
+
+NAN = float('nan')
+
+
+class RunningAggregate(object):
+    """
+    Incremental (prefix-scan) equivalent of an AGGREGATE_FUNCTIONS entry:
+    call add() for each value in a series, and value() returns the
+    aggregate of all values added so far, without re-scanning them.
+
+    SUM, COUNT, AVG, MIN, MAX, PRODUCT, DIFFERENCE, RATIO, FIRST, and
+    LAST keep constant state; MEDIAN keeps two heaps (lower half as a
+    max-heap of negated values, upper half as a min-heap), so each
+    add() is O(log n).  For an empty prefix, value() returns 0 for SUM
+    and COUNT, NaN for AVG, and None otherwise.
+    """
+
+    FOLDS = {
+        'SUM': operator.add,
+        'PRODUCT': operator.mul,
+        'DIFFERENCE': operator.sub,
+        'RATIO': lambda a, b: a / float(b),
+        'MIN': min,
+        'MAX': max,
+        'FIRST': lambda a, b: a,
+        'LAST': lambda a, b: b,
+        }
+
+    def __init__(self, name='SUM'):
+        if name not in self.FOLDS and name not in ('AVG', 'COUNT', 'MEDIAN'):
+            raise ValueError('Unknown aggregate function: %s' % name)
+        self.name = name
+        self.count = 0
+        self.total = 0
+        self.acc = None
+        self._lower = []   # max-heap (negated values)
+        self._upper = []   # min-heap
+
+    def add(self, v):
+        self.count += 1
+        self.total += v
+        name = self.name
+        if name == 'MEDIAN':
+            return self._add_median(v)
+        fold = self.FOLDS.get(name)
+        if fold is not None:
+            self.acc = v if self.count == 1 else fold(self.acc, v)
+
+    def _add_median(self, v):
+        lower, upper = self._lower, self._upper
+        if lower and v > -lower[0]:
+            heapq.heappush(upper, v)
+        else:
+            heapq.heappush(lower, -v)
+        # rebalance: len(lower) == len(upper) or len(upper) + 1
+        if len(lower) > len(upper) + 1:
+            heapq.heappush(upper, -heapq.heappop(lower))
+        elif len(upper) > len(lower):
+            heapq.heappush(lower, -heapq.heappop(upper))
+
+    def value(self):
+        name = self.name
+        if name == 'COUNT':
+            return self.count
+        if name == 'SUM':
+            return self.total
+        if name == 'AVG':
+            return float(self.total) / self.count if self.count else NAN
+        if name == 'MEDIAN':
+            if not self.count:
+                return None
+            if self.count % 2:
+                return -self._lower[0]
+            return (-self._lower[0] + self._upper[0]) / 2.0
+        return self.acc
+
+
+def running(values, name='SUM'):
+    """
+    Given sequence of values (None or NaN values are skipped, but still
+    yield the aggregate-to-date), return list of prefix aggregates for
+    named function, in a single pass.
+    """
+    agg = RunningAggregate(name)
+    result = []
+    for v in values:
+        if v is not None and v == v:  # v != v only for NaN
+            agg.add(v)
+        result.append(agg.value())
+    return result
+
+
+# date bucketing for aggregation of points, by granularity name:
+
+def _quarter_start(d):
+    return d.replace(month=((d.month - 1) // 3) * 3 + 1, day=1)
+
+
+def _isoweek_start(d):
+    return d - timedelta(days=d.weekday())  # Monday of ISO week
+
+
+BUCKET_FUNCTIONS = {
+    '': lambda d: d,  # exact date
+    'month': lambda d: d.replace(day=1),
+    'quarter': _quarter_start,
+    'isoweek': _isoweek_start,
+    }
+
+
+def group_points(points, granularity='', key='start'):
+    """
+    Bucket points (dicts) by date in key, in a single pass, returning
+    list of (bucket start date, list of points) tuples, sorted by date.
+    Points without a value (None or NaN) are not included in buckets.
+    """
+    _bucket = BUCKET_FUNCTIONS[granularity or '']
+    buckets = {}
+    for point in points:
+        value = point.get('value', NAN)
+        if value is None or value != value:
+            continue  # no value, or NaN
+        d = point.get(key, None)
+        if d is not None:
+            d = _bucket(d)
+        buckets.setdefault(d, []).append(point)
+    return sorted(buckets.items(), key=lambda pair: pair[0])
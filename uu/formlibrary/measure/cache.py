@@ -1,28 +1,88 @@
+import cPickle
+import os
 import sys
 
+from Acquisition import aq_parent, aq_inner
+from DateTime import DateTime
 from interfaces import IDataPointCache
 from persistent.mapping import PersistentMapping
 from persistent.list import PersistentList
 from plone.uuid.interfaces import IUUID
 from Products.CMFCore.interfaces import ISiteRoot
 from Products.CMFCore.utils import getToolByName
-from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOBTree, OOTreeSet
 from zope.annotation.interfaces import IAnnotations
 from zope.component import adapts
 from zope.component.hooks import getSite
 from zope.interface import implements
 from zope.schema import ValidationError
+from ZODB.POSException import ConflictError
 
 from uu.workflows.utils import history_log
 from uu.formlibrary import product_log
-from uu.formlibrary.interfaces import FORM_TYPES
+from uu.formlibrary.interfaces import FORM_TYPES, DEFINITION_TYPE
+from uu.formlibrary.utils import env_flag, resolve_uids
 from uu.formlibrary.measure.interfaces import MEASURE_DEFINITION_TYPE
 from uu.formlibrary.measure.interfaces import GROUP_TYPE
+from coerce import STORE_NUMERIC, store_numeric
+from lru import LRUCache
+import profiling
 from utils import isbrain, modified
 
 
 ANNO_KEY = 'uu.formlibrary.DATAPOINTCACHE'
 
+# deferred reload: if set in environment, event handlers only enqueue the
+# UID of modified content, for reload by a worker calling process_queue():
+DEFERRED_RELOAD = env_flag('UU_FORMLIBRARY_DEFERRED_RELOAD')
+
+# in-process tier in front of persistent cache, bounded by entry count, and
+# optionally by approximate size in bytes; values are tuples of dict items:
+DATAPOINT_LRU = LRUCache(
+    maxsize=int(os.environ.get('UU_FORMLIBRARY_DATAPOINT_LRU_SIZE', 50000)),
+    maxbytes=int(os.environ.get('UU_FORMLIBRARY_DATAPOINT_LRU_BYTES', 0)),
+    )
+
+
+# compact datapoint record: a tuple of values for these fields, pickled
+# inline in BTree buckets, not a persistent object per point; 'url' is not
+# stored, but derived from form (or brain) when read by measure:
+RECORD_FIELDS = (
+    'title',
+    'path',
+    'start',
+    'value',
+    'raw_value',
+    'display_value',
+    'user_notes',
+    'raw_numerator',
+    'raw_denominator',
+    )
+
+# fields omitted from datapoint dict when None:
+OPTIONAL_FIELDS = ('raw_numerator', 'raw_denominator')
+
+
+def pack_point(point):
+    """Given datapoint mapping, return compact record tuple"""
+    return tuple(point.get(name) for name in RECORD_FIELDS)
+
+
+def unpack_point(record):
+    """
+    Given compact record tuple (or legacy mapping), return datapoint
+    dict, without 'url'.
+    """
+    if not isinstance(record, tuple):
+        point = dict(record)  # legacy PersistentMapping value
+        point.pop('url', None)
+        return point
+    point = dict(zip(RECORD_FIELDS, record))
+    for name in OPTIONAL_FIELDS:
+        if point[name] is None:
+            del(point[name])
+    return point
+
 
 # cache key for a datapoint for form (or brain-for-form) context:
 def datapoint_cache_key(method, self, context):
@@ -35,12 +95,11 @@ def datapoint_cache_key(method, self, context):
     Note: use string timestamps for cache keys, as they should consume
     half the space (persisted) or RAM as storing a DateTime 3.x object.
     """
-    usebrain = isbrain(context)
-    # consistent UID getter works with brains and form content:
-    _uid = lambda o: o.UID if usebrain else IUUID(o)
+    # consistent UID getter works with brains and content:
+    _uid = lambda o: o.UID if isbrain(o) else IUUID(o)
     # consistent timestamp getter for content objects and brains:
     return (
-        IUUID(self),
+        _uid(self),
         modified(self),
         _uid(context),
         modified(context),
@@ -52,10 +111,107 @@ def _get(uid, site=None):
     Unlike implementation of plone.app.uuid.utils.uuidToObject(),
     this function does not do permissions checks to obtain object.
     """
-    site = site or getSite()
-    catalog = getToolByName(site, 'portal_catalog')
-    r = catalog.unrestrictedSearchResults({'UID': uid})
-    return r[0]._unrestrictedGetObject() if r else None
+    return resolve_uids([uid], site).get(str(uid))
+
+
+class DefinitionIndex(object):
+    """
+    Persistent bidirectional index of form definition UID to UIDs of
+    bound measures and forms (and of each such UID to its definition
+    UID), stored in site annotations.  Maintained by event handlers for
+    forms, measures, and measure groups; rebuild() populates the index
+    from the catalog.
+    """
+
+    index_key = 'definition_index'
+
+    def __init__(self, context=None):
+        self.context = context if context is not None else getSite()
+        annotations = IAnnotations(self.context)
+        data = annotations.get(ANNO_KEY)
+        if data is None:
+            annotations[ANNO_KEY] = data = PersistentMapping()
+        index = data.get(self.index_key)
+        if index is None:
+            index = data[self.index_key] = PersistentMapping()
+            self._init_index(index)
+        self._index = index
+
+    def _init_index(self, index):
+        index['measure'] = OOBTree()  # definition UID -> measure UIDs
+        index['form'] = OOBTree()     # definition UID -> form UIDs
+        index['bound'] = OOBTree()    # content UID -> (kind, definition UID)
+        index['built'] = False
+
+    @property
+    def built(self):
+        return self._index.get('built', False)
+
+    def kind(self, uid):
+        """Return 'measure', 'form', or None for unknown UID"""
+        bound = self._index['bound'].get(str(uid))
+        return bound[0] if bound else None
+
+    def definition_for(self, uid):
+        """Return definition UID for measure or form UID, or None"""
+        bound = self._index['bound'].get(str(uid))
+        return bound[1] if bound else None
+
+    def measures(self, definition_uid):
+        return list(self._index['measure'].get(str(definition_uid), ()))
+
+    def forms(self, definition_uid):
+        return list(self._index['form'].get(str(definition_uid), ()))
+
+    def unbind(self, uid):
+        uid = str(uid)
+        bound = self._index['bound'].get(uid)
+        if bound is None:
+            return
+        kind, definition_uid = bound
+        uids = self._index[kind].get(definition_uid)
+        if uids is not None and uid in uids:
+            uids.remove(uid)
+            if not len(uids):
+                del(self._index[kind][definition_uid])
+        del(self._index['bound'][uid])
+
+    def bind(self, kind, uid, definition_uid):
+        """
+        Bind measure or form (kind is 'measure' or 'form') UID to
+        definition UID; definition_uid of None unbinds.
+        """
+        assert kind in ('measure', 'form')
+        uid = str(uid)
+        if definition_uid is None:
+            return self.unbind(uid)
+        definition_uid = str(definition_uid)
+        if self._index['bound'].get(uid) == (kind, definition_uid):
+            return  # unchanged, avoid write
+        self.unbind(uid)
+        self._index['bound'][uid] = (kind, definition_uid)
+        if definition_uid not in self._index[kind]:
+            self._index[kind][definition_uid] = OOTreeSet()
+        self._index[kind][definition_uid].insert(uid)
+
+    def rebuild(self):
+        """Clear, then populate index from catalog"""
+        catalog = getToolByName(self.context, 'portal_catalog')
+        search = catalog.unrestrictedSearchResults
+        self._init_index(self._index)
+        for brain in search({'portal_type': DEFINITION_TYPE}):
+            form_query = {'references': brain.UID, 'portal_type': FORM_TYPES}
+            for form_brain in search(form_query):
+                self.bind('form', form_brain.UID, brain.UID)
+        for brain in search({'portal_type': GROUP_TYPE}):
+            group = brain._unrestrictedGetObject()
+            measure_query = {
+                'path': {'query': brain.getPath(), 'depth': 1},
+                'portal_type': MEASURE_DEFINITION_TYPE,
+                }
+            for measure_brain in search(measure_query):
+                self.bind('measure', measure_brain.UID, group.definition)
+        self._index['built'] = True
 
 
 class DataPointCache(object):
@@ -69,6 +225,8 @@ class DataPointCache(object):
     
     content_key = 'uid_keys'
     data_cache_key = 'data_cache'
+    warm_state_key = 'warm_state'
+    queue_key = 'reload_queue'
     
     def __init__(self, context=None):
         self.context = context if context is not None else getSite()
@@ -86,6 +244,53 @@ class DataPointCache(object):
         if self._data_cache is None:
             self._data_cache = data[self.data_cache_key] = OOBTree()
         self.catalog = getToolByName(self.context, 'portal_catalog')
+        self._definitions = None
+
+    def definition_index(self):
+        """Get DefinitionIndex for site, built if not previously built"""
+        if self._definitions is None:
+            self._definitions = DefinitionIndex(self.context)
+            if not self._definitions.built:
+                self._definitions.rebuild()
+        return self._definitions
+
+    def _keyset(self, uid, create=False):
+        """
+        Get OOTreeSet of cache keys for content UID, or None; converts
+        legacy PersistentList values, if found, to OOTreeSet.
+        """
+        keys = self._content_keys.get(uid)
+        if isinstance(keys, PersistentList):
+            keys = self._content_keys[uid] = OOTreeSet(keys)
+        if keys is None and create:
+            keys = self._content_keys[uid] = OOTreeSet()
+        return keys
+
+    def migrate_content_keys(self):
+        """
+        Convert any legacy PersistentList values in UID-to-keys index
+        to OOTreeSet, returns count of converted values.
+        """
+        legacy = [
+            uid for uid, keys in self._content_keys.items()
+            if isinstance(keys, PersistentList)
+            ]
+        for uid in legacy:
+            self._keyset(uid)
+        return len(legacy)
+
+    def migrate_records(self):
+        """
+        Convert any legacy PersistentMapping values in cache to compact
+        record tuples, returns count of converted values.
+        """
+        legacy = [
+            key for key, record in self._data_cache.iteritems()
+            if not isinstance(record, tuple)
+            ]
+        for key in legacy:
+            self._data_cache[key] = pack_point(self._data_cache[key])
+        return len(legacy)
 
     def search(self, query):
         return self.catalog.unrestrictedSearchResults(query)
@@ -114,7 +319,36 @@ class DataPointCache(object):
     
     def get(self, key, default=None):
         key = self._normalize_key(key)
-        return self._data_cache.get(key)
+        record = self._data_cache.get(key)
+        return unpack_point(record) if record is not None else default
+
+    def lookup(self, key):
+        """
+        Two-tier read of datapoint for key: returns dict (without 'url')
+        from in-process LRU, or from the persistent cache (populating the
+        LRU), or None if key is in neither.
+        """
+        key = self._normalize_key(key)
+        record = DATAPOINT_LRU.get(key)
+        if record is None:
+            record = self._data_cache.get(key)
+            if record is None:
+                profiling.count('cache.miss')
+                return None
+            profiling.count('cache.zodb.hit')
+            if not isinstance(record, tuple):
+                record = pack_point(record)  # legacy PersistentMapping
+            DATAPOINT_LRU.put(key, record)
+        else:
+            profiling.count('cache.lru.hit')
+        return unpack_point(record)
+
+    def remember(self, key, point):
+        """
+        Keep computed datapoint for key in in-process LRU only; as keys
+        embed modification times, this needs no invalidation.
+        """
+        DATAPOINT_LRU.put(self._normalize_key(key), pack_point(point))
 
     def keys(self):
         return list(self.iterkeys())
@@ -126,13 +360,15 @@ class DataPointCache(object):
         return list(self.iteritems())
         
     def iteritems(self):
-        return self._data_cache.iteritems()
+        for key, record in self._data_cache.iteritems():
+            yield (key, unpack_point(record))
     
     def values(self):
         return list(self.itervalues())
     
     def itervalues(self):
-        return self._data_cache.itervalues()
+        for record in self._data_cache.itervalues():
+            yield unpack_point(record)
 
     def __contains__(self, key):
         key = self._normalize_key(key)
@@ -145,15 +381,11 @@ class DataPointCache(object):
     
     def store(self, key, value):
         key = self._normalize_key(key)
-        if not isinstance(value, PersistentMapping):
-            value = PersistentMapping(value)
-        self._data_cache[key] = value
+        self._data_cache[key] = pack_point(value)
         ## content-UID to keys, used by self.select(),
         ##  self.reload(), and self.invalidate()
         for uid in (key[0], key[2]):
-            if not self._content_keys.get(uid):
-                self._content_keys[uid] = PersistentList()
-            self._content_keys[uid].append(key)
+            self._keyset(uid, create=True).insert(key)
 
     __setitem__ = store
 
@@ -164,16 +396,16 @@ class DataPointCache(object):
         measure_uid, form_uid = key[0], key[2]
         del(self._data_cache[key])
         for uid in (measure_uid, form_uid):
-            if uid in self._content_keys:
-                if key in self._content_keys[uid]:
-                    self._content_keys[uid].remove(key)
+            keys = self._keyset(uid)
+            if keys is not None and key in keys:
+                keys.remove(key)
 
     # content-UID to key selection:
     
     def select(self, uid):
         uid = str(uid)
         keys = self._content_keys.get(uid)
-        return filter(lambda k: k in self, keys) if keys else []
+        return [k for k in keys if k in self._data_cache] if keys else []
 
     def invalidate(self, uid):
         uid = str(uid)
@@ -190,14 +422,18 @@ class DataPointCache(object):
         uid = str(uid)
         self.invalidate(uid)
         ## now determine if uid is for measure or for a form:
+        kind = self.definition_index().kind(uid)
+        if kind == 'measure':
+            return self._cache_datapoints_for_measure(uid)
+        if kind == 'form':
+            return self._cache_datapoints_for_form(uid)
         brain = self._content_brain(uid)
         if brain is None:
             # in cases (e.g. testing) where no brain, just invalidate (above)
             return
         if brain.portal_type == MEASURE_DEFINITION_TYPE:
-            self._cache_datapoints_for_measure(uid)
-        else:
-            self._cache_datapoints_for_form(uid)
+            return self._cache_datapoints_for_measure(uid)
+        return self._cache_datapoints_for_form(uid)
     
     def _related_form_uids(self, uid):
         """
@@ -205,6 +441,9 @@ class DataPointCache(object):
         form and the measure group containing relevant measures
         use the same form definition.
         """
+        index = self.definition_index()
+        if index.kind(uid) == 'measure':
+            return index.forms(index.definition_for(uid))
         measure = _get(uid, self.context)
         group = measure.__parent__
         formdefn_uid = group.definition
@@ -218,20 +457,28 @@ class DataPointCache(object):
     def _cache_datapoints_for_measure(self, uid):
         """
         Given measure UID, cache form values for all forms using the
-        same form definition as measure.
+        same form definition as measure.  Returns count of points stored.
         """
         measure = _get(uid, self.context)
-        for f_uid in self._related_form_uids(uid):
-            form = _get(f_uid, self.context)
+        self.definition_index().bind(
+            'measure',
+            uid,
+            measure.__parent__.definition,
+            )  # ensure index is current, before use
+        forms = resolve_uids(self._related_form_uids(uid), self.context)
+        stored = 0
+        for form in forms.values():
             key = datapoint_cache_key(None, measure, form)
             try:
                 point = measure._datapoint(form)
                 self.store(key, point)
+                stored += 1
             except KeyError:
                 print 'Could not compute point for %s + %s' % (
                     '/'.join(measure.getPhysicalPath()),
                     '/'.join(form.getPhysicalPath())
                     )
+        return stored
 
     def _related_measure_uids(self, uid):
         """
@@ -239,6 +486,9 @@ class DataPointCache(object):
         both the form and the measure group containing relevant measures
         use the same form definition.
         """
+        index = self.definition_index()
+        if index.kind(uid) == 'form':
+            return index.measures(index.definition_for(uid))
         form = _get(uid, self.context)
         formdefn_uid = form.definition  # use UID, do not resolve directly
         group_query = {
@@ -260,15 +510,18 @@ class DataPointCache(object):
         """
         Given form UID, cache form values for all applicable measures,
         where applicable is defined as all measures in groups using the
-        same form definition as the form.
+        same form definition as the form.  Returns count of points stored.
         """
+        stored = 0
         form = _get(uid, self.context)
-        for m_uid in self._related_measure_uids(uid):
-            measure = _get(m_uid, self.context)
+        self.definition_index().bind('form', uid, form.definition)
+        measures = resolve_uids(self._related_measure_uids(uid), self.context)
+        for measure in measures.values():
             key = datapoint_cache_key(None, measure, form)
             try:
                 point = measure._datapoint(form)
                 self.store(key, point)
+                stored += 1
             except (KeyError, ValidationError):
                 exc = sys.exc_info()
                 product_log.warn(
@@ -277,6 +530,50 @@ class DataPointCache(object):
                         form,
                         exc[1].message,
                     ))
+        return stored
+
+    def _current_timestamps(self, uids):
+        """
+        Given iterable of UIDs, return dict of UID to string timestamp of
+        current modification time, for all UIDs resolving to content.
+        """
+        brains = resolve_uids(uids, self.context, objects=False)
+        return dict((uid, str(modified(b))) for uid, b in brains.items())
+
+    def compact(self):
+        """
+        Garbage-collect cache: remove keys for which either measure
+        or form UID no longer resolves to content, or for which either
+        timestamp is not the current modification time of the content
+        (superseded keys); also prune stale keys from the UID-to-keys
+        index.  Returns dict of counts for removed entries ('entries'),
+        pruned index references ('index_entries'), and approximate
+        pickled size in bytes of the removed entries ('bytes').
+        """
+        uids = set(uid for uid in self._content_keys.keys())
+        for key in self.iterkeys():
+            uids.update((key[0], key[2]))
+        current = self._current_timestamps(uids)
+        _current = lambda uid, stamp: current.get(uid) == stamp
+        stale = [
+            key for key in self.iterkeys()
+            if not (_current(key[0], key[1]) and _current(key[2], key[3]))
+            ]
+        stats = {'entries': 0, 'index_entries': 0, 'bytes': 0}
+        for key in stale:
+            value = self._data_cache[key]
+            stats['bytes'] += len(cPickle.dumps((key, value), 2))
+            del(self[key])
+            stats['entries'] += 1
+        for uid in list(self._content_keys.keys()):
+            keys = self._keyset(uid)
+            dead = [k for k in keys if k not in self._data_cache]
+            for key in dead:
+                keys.remove(key)
+            stats['index_entries'] += len(dead)
+            if not len(keys):
+                del(self._content_keys[uid])
+        return stats
 
     def warm(self):
         """Warm cache, site-wide"""
@@ -287,10 +584,240 @@ class DataPointCache(object):
         for brain in measure_brains:
             self.reload(brain.UID)
 
+    def _warm_state(self):
+        """
+        Persistent mapping of incremental warming state (change-journal
+        high-water mark and checkpoint for resumption of a run).
+        """
+        data = IAnnotations(self.context).get(ANNO_KEY)
+        state = data.get(self.warm_state_key)
+        if state is None:
+            state = data[self.warm_state_key] = PersistentMapping()
+        return state
+
+    def _store_point(self, key, measure, form):
+        """
+        Compute and store point for measure, form; returns True on
+        success, or logs and returns False if point cannot be computed.
+        """
+        try:
+            self.store(key, measure._datapoint(form))
+        except (KeyError, ValidationError):
+            exc = sys.exc_info()
+            product_log.warn(
+                'Measure %s unable to cache point for form %s -- %s' % (
+                    measure,
+                    form,
+                    exc[1].message,
+                ))
+            return False
+        return True
+
+    def _measure_definition(self, measure_brain):
+        """
+        Definition UID of measure (as brain) from definition index;
+        measure is woken, and bound in index, only if not yet indexed.
+        """
+        index = self.definition_index()
+        uid = measure_brain.UID
+        if index.kind(uid) != 'measure':
+            measure = measure_brain._unrestrictedGetObject()
+            index.bind('measure', uid, measure.__parent__.definition)
+        return index.definition_for(uid)
+
+    def warm_incremental(self, batch_size=100, commit=None):
+        """
+        Incremental alternative to warm(): only (measure, form) pairs
+        with stale or missing keys are computed.  A measure counts as
+        changed if it, or its group (which may have been re-bound to
+        another form definition), was modified since the high-water mark
+        of the last completed run; for other measures, only forms
+        modified since are considered.  Related forms are found using
+        the definition index, and keys are computed from catalog brains,
+        so measures and forms are woken only to compute points.
+
+        Measures are visited in UID order; after each measure completing
+        a batch of at least batch_size stored points, a checkpoint is
+        recorded and commit(site, message) is called, if provided, such
+        that an interrupted run resumes after the last checkpoint.
+
+        Returns count of points stored.
+        """
+        state = self._warm_state()
+        high_water = state.get('high_water')
+        high_water = DateTime(high_water) if high_water else None
+        resume_after = state.get('resume_after')
+        if not state.get('run_started'):
+            state['run_started'] = str(DateTime())
+        changed_forms = None
+        if high_water is not None:
+            changed_query = {
+                'portal_type': FORM_TYPES,
+                'modified': {'query': high_water, 'range': 'min'},
+                }
+            changed_forms = set(b.UID for b in self.search(changed_query))
+        groups = dict(
+            (b.getPath(), b) for b in self.search({'portal_type': GROUP_TYPE})
+            )
+        _changed = lambda brain: brain is not None and (
+            modified(brain) >= high_water)
+        measure_brains = sorted(
+            self.search({'portal_type': MEASURE_DEFINITION_TYPE}),
+            key=lambda b: b.UID,
+            )
+        if resume_after:
+            measure_brains = [
+                b for b in measure_brains if b.UID > resume_after
+                ]
+        index = self.definition_index()
+        form_brains = {}  # form UID -> brain, resolved once per run
+        stored = pending = 0
+        for measure_brain in measure_brains:
+            group_path = measure_brain.getPath().rsplit('/', 1)[0]
+            measure_changed = high_water is None or (
+                _changed(measure_brain) or _changed(groups.get(group_path)))
+            form_uids = index.forms(self._measure_definition(measure_brain))
+            if not measure_changed:
+                form_uids = [uid for uid in form_uids if uid in changed_forms]
+            unresolved = [uid for uid in form_uids if uid not in form_brains]
+            if unresolved:
+                form_brains.update(
+                    resolve_uids(unresolved, self.context, objects=False)
+                    )
+            measure = None  # woken only if needed
+            for form_uid in form_uids:
+                form_brain = form_brains.get(form_uid)
+                if form_brain is None:
+                    continue  # indexed, but not (yet) in catalog
+                key = datapoint_cache_key(None, measure_brain, form_brain)
+                if key in self:
+                    continue  # up-to-date
+                if measure is None:
+                    measure = measure_brain._unrestrictedGetObject()
+                form = form_brain._unrestrictedGetObject()
+                if self._store_point(key, measure, form):
+                    pending += 1
+            if pending >= batch_size:
+                stored += pending
+                pending = 0
+                state['resume_after'] = measure_brain.UID
+                if commit is not None:
+                    commit(self.context, 'Incremental data point cache warm')
+        stored += pending
+        # completed run: the start of this run is the new high-water mark
+        state['high_water'] = state['run_started']
+        state['resume_after'] = None
+        state['run_started'] = None
+        return stored
+
+    # deferred reload queue:
+
+    def _queue(self):
+        """
+        OOTreeSet of UIDs queued for deferred reload; as a set, repeated
+        modification of the same content is de-duplicated.
+        """
+        data = IAnnotations(self.context).get(ANNO_KEY)
+        queue = data.get(self.queue_key)
+        if queue is None:
+            queue = data[self.queue_key] = OOTreeSet()
+        return queue
+
+    def enqueue(self, uid):
+        """Queue UID of measure or form for deferred reload"""
+        self._queue().insert(str(uid))
+
+    def queued(self):
+        """Return list of UIDs queued for deferred reload"""
+        return list(self._queue())
+
+    def process_queue(self, batch_size=20, commit=None):
+        """
+        Drain queue of UIDs for deferred reload, in batches of up to
+        batch_size UIDs; after each batch, commit(site, message) is
+        called if provided.  A UID failing to reload (other than by
+        ConflictError) is logged and dropped from the queue, so it
+        does not block the queue.  Returns count of UIDs reloaded.
+        """
+        queue = self._queue()
+        count = 0
+        while len(queue):
+            batch = list(queue.keys()[:batch_size])
+            for uid in batch:
+                queue.remove(uid)
+                try:
+                    self.reload(uid)
+                except ConflictError:
+                    raise
+                except Exception:
+                    product_log.exception(
+                        'Dropped %s from data point reload queue, '
+                        'reload failed' % uid
+                        )
+                    continue
+                count += 1
+            if commit is not None:
+                commit(self.context, 'Deferred data point cache reload')
+        return count
+
+
+def reload_or_enqueue(uid):
+    """
+    Reload data points for UID of measure or form, or just enqueue the
+    UID when deferred reload is configured.
+    """
+    cache = DataPointCache()
+    if DEFERRED_RELOAD:
+        cache.enqueue(uid)
+        return
+    cache.reload(uid)
+
+
+def handle_form_moved(context, event):
+    """Maintain definition index for added, moved, or removed form"""
+    index = DefinitionIndex()
+    if event.newParent is None:
+        index.unbind(IUUID(context))
+        return
+    index.bind('form', IUUID(context), getattr(context, 'definition', None))
+
+
+def handle_form_modify(context, event):
+    """Maintain definition index for possible change of form definition"""
+    DefinitionIndex().bind(
+        'form',
+        IUUID(context),
+        getattr(context, 'definition', None),
+        )
+
+
+def handle_measure_moved(context, event):
+    """Maintain definition index for added, moved, or removed measure"""
+    index = DefinitionIndex()
+    if event.newParent is None:
+        index.unbind(IUUID(context))
+        return
+    # not event.newParent: when a group is moved, renamed, or copied, the
+    # same event is dispatched to contained measures, with the new parent
+    # of the group (not the group) as newParent:
+    group = aq_parent(aq_inner(context))
+    index.bind('measure', IUUID(context), getattr(group, 'definition', None))
+
+
+def handle_group_modify(context, event):
+    """Maintain definition index for measures in (possibly re-bound) group"""
+    index = DefinitionIndex()
+    for measure in context.contentValues():
+        if measure.portal_type == MEASURE_DEFINITION_TYPE:
+            index.bind('measure', IUUID(measure), context.definition)
+
 
 def handle_simpleform_modify(context, event):
+    if STORE_NUMERIC:
+        # pre-normalize numeric answers, so measures need not parse text:
+        store_numeric(context)
     # invalidate all cached data points to which the form is relevant:
-    DataPointCache().reload(IUUID(context))
+    reload_or_enqueue(IUUID(context))
 
 
 def handle_measure_modify(context, event):
@@ -302,13 +829,12 @@ def handle_measure_modify(context, event):
     # both numerator and denominator:
     context._v_q_numerator = None
     context._v_q_denominator = None
-    # invalidate cache of built repoze.catalog query:
-    context._v_query_numerator = None
-    context._v_query_denominator = None
+    # (built repoze.catalog queries are cached by modification time, see
+    # plan.query_for(), so need no invalidation here)
     # ensure that all connections, instances, threads have fresh objects,
     # with no stale _v_ prefixed volatile attributes -- invalidates the
     # measure for all ZODB connections:
     context._p_changed = True
     # invalidate all cached data points to which the measure is relevant:
-    DataPointCache().reload(IUUID(context))
+    reload_or_enqueue(IUUID(context))
 
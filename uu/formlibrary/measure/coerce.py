@@ -0,0 +1,99 @@
+import os
+
+from Acquisition import aq_base
+from zope.schema import getFieldNamesInOrder
+
+from uu.formlibrary.utils import env_flag
+
+
+# sentinel value:
+NOVALUE = float('NaN')
+
+VALUEMAP = {
+    'yes': 1.0,
+    'no': 0.0,
+    'n/a': NOVALUE,
+}
+
+isnumber = lambda v: any(isinstance(v, t) for t in (int, long, float))
+
+# process-wide memo of answer text to number, bounded by entry count
+# (emptied when full, as plain dict get/set is safe without locking):
+MEMO_SIZE = int(os.environ.get('UU_FORMLIBRARY_COERCE_MEMO_SIZE', 20000))
+_memo = {}
+
+# if set in environment, store (raw, number) pairs on simple form records
+# when forms are saved, see store_numeric():
+STORE_NUMERIC = env_flag('UU_FORMLIBRARY_STORE_NUMERIC')
+
+NUMERIC_ATTR = '_numeric'
+
+
+def _parse_text(text):
+    # Look for yes, no, n/a type choice answers as 0, 1, NOVALUE:
+    v = VALUEMAP.get(text.strip().lower(), None)
+    if v is None:
+        v = VALUEMAP.get(
+            text.strip().lower().replace(',', '').split(' ')[0],
+            None,
+            )
+    # finally, try to cast string value to a number
+    if v is None:
+        try:
+            # crude tokenization would treat '3 months' as 3.0
+            v = float(text.strip().split(' ')[0])
+        except ValueError:
+            v = NOVALUE
+    return v
+
+
+def coerce_text(text):
+    """Number (or NOVALUE) for answer text, memoized per process"""
+    v = _memo.get(text)
+    if v is None:
+        v = _parse_text(text)
+        if len(_memo) >= MEMO_SIZE:
+            _memo.clear()
+        _memo[text] = v
+    return v
+
+
+def coerce_value(v):
+    """
+    Duck-type a raw answer value as a number: numbers (and booleans)
+    as-is, None as NOVALUE, and strings via coerce_text().
+    """
+    if v is None:
+        return NOVALUE
+    if isinstance(v, basestring):
+        return coerce_text(v)
+    return v
+
+
+def stored_numeric(record, name, raw):
+    """
+    Pre-normalized number stored for field name on record, if stored
+    for the same raw value; otherwise None.
+    """
+    stored = getattr(aq_base(record), NUMERIC_ATTR, None)
+    if stored is None or name not in stored:
+        return None
+    stored_raw, number = stored[name]
+    return number if stored_raw == raw else None
+
+
+def store_numeric(form):
+    """
+    Store (raw, number) pairs next to answers of each fieldset record
+    of a simple (flex) form, so reads need not re-parse answer text.
+    """
+    for record in getattr(form, 'data', {}).values():
+        schema = getattr(record, 'schema', None)
+        if schema is None:
+            continue
+        numeric = {}
+        for name in getFieldNamesInOrder(schema):
+            raw = getattr(record, name, None)
+            if raw is None or isinstance(raw, basestring) or isnumber(raw):
+                numeric[name] = (raw, coerce_value(raw))
+        setattr(record, NUMERIC_ATTR, numeric)
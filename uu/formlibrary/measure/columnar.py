@@ -0,0 +1,73 @@
+from array import array
+from itertools import compress
+
+from interfaces import AGGREGATE_FUNCTIONS
+import profiling
+
+
+NAN = float('nan')
+
+
+class Column(object):
+    """
+    Compact numeric column for one field across records: values are
+    an array('d') (NaN for missing values), and mask is a bytearray with
+    1 for each record that has a (not None) value, 0 otherwise.
+    """
+
+    def __init__(self):
+        self.values = array('d')
+        self.mask = bytearray()
+        self.missing = 0
+
+    def append(self, v):
+        if v is None:
+            self.values.append(NAN)
+            self.mask.append(0)
+            self.missing += 1
+        else:
+            self.values.append(float(v))  # may raise, as float() does
+            self.mask.append(1)
+
+    def present(self):
+        """Array of only present (not None) values, in record order"""
+        if not self.missing:
+            return self.values
+        return array('d', compress(self.values, self.mask))
+
+    def __len__(self):
+        return len(self.values)
+
+
+def extract_columns(records, fieldpaths):
+    """
+    Walk records once, returning dict of fieldpath to Column for each
+    of the (distinct) field paths.
+    """
+    fieldpaths = tuple(set(fieldpaths))
+    columns = dict((path, Column()) for path in fieldpaths)
+    appenders = [(path, columns[path].append) for path in fieldpaths]
+    scanned = 0
+    for record in records:
+        scanned += 1
+        for path, append in appenders:
+            append(getattr(record, path, None))
+    profiling.count('records.scanned', scanned)
+    return columns
+
+
+def summarize(records, specs):
+    """
+    Given records and a sequence of (fieldpath, function name) tuples
+    naming keys of AGGREGATE_FUNCTIONS, extract all field paths in one
+    pass over records, and return dict of each spec tuple to its
+    aggregate value, computed over present values of the field.
+    """
+    specs = list(specs)
+    columns = extract_columns(records, [path for path, name in specs])
+    present = dict((path, col.present()) for path, col in columns.items())
+    result = {}
+    for path, name in specs:
+        fn = AGGREGATE_FUNCTIONS.get(name)
+        result[(path, name)] = fn(present[path])
+    return result
@@ -4,44 +4,41 @@ from itertools import chain
 import math
 
 from Acquisition import aq_parent, aq_inner, aq_base
+from BTrees.OOBTree import OOBTree, OOTreeSet
 from DateTime import DateTime
 from plone.dexterity.content import Container, Item
 from plone.indexer.decorator import indexer
-from plone.memoize import ram
 from plone.uuid.interfaces import IUUID
 from plone.app.uuid.utils import uuidToObject
 from plone.app.layout.navigation.root import getNavigationRoot
 from pytz import UTC
 from repoze.catalog import query
-from zope.component import queryAdapter
+from zope.annotation.interfaces import IAnnotations
 from zope.component.hooks import getSite
 from zope.interface import implements
 
 from uu.formlibrary.interfaces import MULTI_FORM_TYPE
 from uu.formlibrary.interfaces import IFormDefinition
-from uu.formlibrary.search.interfaces import IComposedQuery
 from uu.formlibrary.search.filters import composed_storage
+from uu.formlibrary.snapshot import record_values
+from uu.formlibrary.utils import resolve_uids
 
 from interfaces import IMeasureDefinition, IMeasureGroup, IMeasureLibrary
 from interfaces import IFormDataSetSpecification
 from interfaces import AGGREGATE_FUNCTIONS, AGGREGATE_LABELS
 from utils import content_path, isbrain, get
 from cache import datapoint_cache_key, DataPointCache
-
-
-# sentinel value:
-NOVALUE = float('NaN')
-
-VALUEMAP = {
-    'yes': 1.0,
-    'no': 0.0,
-    'n/a': NOVALUE,
-}
+from aggregate import group_points, running
+from coerce import NOVALUE, coerce_value, stored_numeric
+from columnar import summarize
+from plan import plan_for, query_for, split_path
+from membership import MEMBERSHIP_ENABLED, membership_for
+import profiling
 
 
 DT = lambda d: DateTime(datetime.datetime(*d.timetuple()[:7], tzinfo=UTC))
 
-isnumber = lambda v: any(isinstance(v, t) for t in (int, long, float))
+_as_date = lambda v: v.date() if isinstance(v, datetime.datetime) else v
 
 
 @indexer(IMeasureDefinition)
@@ -113,27 +110,29 @@ class MeasureDefinition(Item):
         return self._flex_field_value(context, path)
 
     def get_query(self, name):
-        attr = '_v_query_%s' % name
-        q = getattr(self, attr, None)
-        if q is None:
-            schema = self.form_definition().schema
-            composed = queryAdapter(self, IComposedQuery, name=name)
-            if not IComposedQuery.providedBy(composed):
-                return None
-            q = composed.build(schema)
-            if not is_query_complete(q):
-                return None  # cannot perform query that is incomplete
-            setattr(self, attr, q)  # cache success
-        return q
+        # cannot perform query that is incomplete, so None for those:
+        return query_for(self, name, complete=is_query_complete)
 
     def _summarized_field_value(self, context, fieldpath, fn):
         """Return summarized value, for field, across all records in context"""
-        fn = AGGREGATE_FUNCTIONS.get(fn)
-        values = filter(
-            lambda v: v is not None,
-            [getattr(record, fieldpath, None) for record in context.values()]
+        spec = (fieldpath, fn)
+        return summarize(record_values(context), [spec])[spec]
+
+    def _summarized_values(self, context, names):
+        """
+        Return dict of name to summarized value for each of names
+        ('numerator' and/or 'denominator') using multi_summarize, reading
+        all records in context once for all summarized fields.
+        """
+        specs = dict(
+            (name, (
+                getattr(self, '%s_field' % name, None),
+                getattr(self, 'summarization_%s' % name, None),
+                ))
+            for name in names
             )
-        return fn([float(v) for v in values])
+        summarized = summarize(record_values(context), specs.values())
+        return dict((name, summarized[spec]) for name, spec in specs.items())
 
     def _mr_get_value(self, context, name):
         """Get raw value for numerator or denominator"""
@@ -160,7 +159,8 @@ class MeasureDefinition(Item):
             if catalog is None:
                 return NOVALUE
             try:
-                v = catalog.rcount(q)           # result count from catalog
+                with profiling.timed('catalog.rcount'):
+                    v = catalog.rcount(q)       # result count from catalog
             except (KeyError, TypeError):
                 # could not perform query against catalog, likely because the
                 # form in question does not have the necessary field(s), so
@@ -170,39 +170,35 @@ class MeasureDefinition(Item):
 
     def _mr_values(self, context):
         """return (n, m) values for numerator, denominator"""
+        names = ('numerator', 'denominator')
+        summarized = [
+            name for name in names
+            if getattr(self, '%s_type' % name, None) == 'multi_summarize'
+            ]
+        if len(summarized) > 1:
+            # both summarized: one pass over records, not one per name
+            values = self._summarized_values(context, summarized)
+            return (values['numerator'], values['denominator'])
         n = self._mr_get_value(context, name='numerator')
         m = self._mr_get_value(context, name='denominator')
         return (n, m)
 
     def _normalized_flex_value(self, record, name):
         """Get, return value and duck-type non-numeric values"""
-        v = original = getattr(record, name, NOVALUE)
-        v = v if v is not None else NOVALUE
-        if v is not NOVALUE and not isnumber(v):
-            if isinstance(v, basestring):
-                # Look for yes, no, n/a type choice answers as 0, 1, NOVALUE:
-                v = VALUEMAP.get(v.strip().lower(), None)
-                if v is None:
-                    v = VALUEMAP.get(
-                        original.strip().lower().replace(',', '').split(' ')[0],
-                        None,
-                        )
-                # finally, try to cast string value to a number
-                if v is None:
-                    try:
-                        # crude tokenization would treat '3 months' as 3.0
-                        v = float(original.strip().split(' ')[0])
-                    except ValueError:
-                        v = NOVALUE
-            elif isinstance(v, bool):
-                v = float(v)
-        return v
+        v = getattr(record, name, NOVALUE)
+        if isinstance(v, basestring):
+            stored = stored_numeric(record, name, v)
+            if stored is not None:
+                return stored
+        return coerce_value(v)
 
     def _flex_field_value(self, context, path, normalize=True):
+        """
+        Get field value from flex form context, given path as string or
+        (pre-split) tuple of fieldset name, field name.
+        """
         data = getattr(context, 'data', {})
-        spec = path.split('/')
-        fieldset = spec[0] if len(spec) > 1 else ''
-        name = spec[1] if len(spec) > 1 else path
+        fieldset, name = path if isinstance(path, tuple) else split_path(path)
         record = data.get(fieldset)
         if record is not None:
             if normalize:
@@ -210,12 +206,12 @@ class MeasureDefinition(Item):
             return getattr(record, name, NOVALUE)
         return NOVALUE
 
-    def _flex_values(self, context):
+    def _flex_values(self, context, plan=None):
         """return raw (n, m) values for numerator, denominator"""
+        plan = plan or self.plan()
         # inital constant / default values:
         n = m = 1
-        nfield = getattr(self, 'numerator_field', None) or None
-        dfield = getattr(self, 'denominator_field', None) or None
+        nfield, dfield = plan.numerator_field, plan.denominator_field
         if nfield is None and dfield is None:
             # no fields defined, NaN
             return (NOVALUE, 1)
@@ -225,41 +221,41 @@ class MeasureDefinition(Item):
             m = self._flex_field_value(context, dfield)
         return (n, m)
 
-    def raw_value(self, context):
+    def plan(self):
+        """
+        Compiled evaluation plan for this measure, see plan.py: kept in
+        a volatile attribute while the modification time and source
+        type of measure are unchanged, otherwise obtained from (or
+        compiled into) the process-wide plan cache.
+        """
+        check = (self.modified(), self._source_type())
+        cached = getattr(self, '_v_plan', None)
+        if cached is not None and cached[0] == check:
+            return cached[1]
+        plan = plan_for(self)
+        self._v_plan = (check, plan)
+        return plan
+
+    def raw_value(self, context, plan=None):
         """
         Get raw value (no rounding or constant multiple), given a form
         instance.
         """
-        is_multi_form = self._source_type() == MULTI_FORM_TYPE
+        plan = plan or self.plan()
         _div = lambda a, b: float(a) / float(b) if b else NOVALUE
         divide = lambda a, b: NOVALUE if a is None or b is None else _div(a, b)
-        vfn = self._mr_values if is_multi_form else self._flex_values
-        return divide(*vfn(context))
-
-    def _normalize(self, v):
-        if math.isnan(v):
-            return v
-        ## constant multiplier
-        v = self.multiplier * v  # multiplier defaults to 1.0
-        ## rounding
-        rrule = self.rounding
-        if rrule:
-            fn = {
-                'round': round,
-                'ceiling': math.ceil,
-                'floor': math.floor,
-                }.get(rrule, round)
-            v = fn(v)
-        if self.numerator_type == 'multi_summarize':
-            return v
-        if self.value_type == 'count':
-            return int(v)  # count is always whole numbers
-        return v  # floating point value, normalized
-
-    def _values(self, context):
+        if plan.multi:
+            return divide(*self._mr_values(context))
+        return divide(*self._flex_values(context, plan))
+
+    def _normalize(self, v, plan=None):
+        return (plan or self.plan()).normalize(v)
+
+    def _values(self, context, plan=None):
         """Return raw and normalized value as a two item tuple"""
-        raw = self.raw_value(context)
-        return (raw, self._normalize(raw))
+        plan = plan or self.plan()
+        raw = self.raw_value(context, plan)
+        return (raw, plan.normalize(raw))
 
     def value_for(self, context):
         """
@@ -268,57 +264,68 @@ class MeasureDefinition(Item):
         """
         return self._values(context)[1]
 
-    def note_for(self, context):
-        if self._source_type() == MULTI_FORM_TYPE:
+    def note_for(self, context, plan=None):
+        plan = plan or self.plan()
+        if plan.multi:
             return getattr(context, 'entry_notes', None)
         # flex form:
-        notesfield = getattr(self, 'notes_field', None) or None
+        notesfield = plan.notes_field
         if notesfield:
             d = self._flex_field_value(context, notesfield, normalize=False)
             if d:
                 return d
         return None
 
-    def _indexed_datapoint(self, context):
-        key = datapoint_cache_key(None, self, context)
-        cache = DataPointCache(self.site())
-        v = cache.get(key, None)
-        return v and dict(v) or None
+    def _point_url(self, context):
+        """
+        URL for form (or brain for form) of a datapoint; not stored in
+        cached datapoint records, but derived on read.
+        """
+        if isbrain(context):
+            url = context.getURL()
+        else:
+            url = context.absolute_url()
+        if 'nohost' in url:
+            # in cases where a point is indexed in non-interactive session,
+            # we need a real URL to work with, assumes that 'site_url'
+            # property is set in portal_properties/site_properties
+            siteid, baseurl = self._base()
+            if baseurl:
+                url = url.replace('http://nohost/%s' % siteid, baseurl)
+        return url
 
-    def _datapoint(self, context):
+    def _datapoint(self, context, plan=None):
         """uncached datapoint implementation"""
         if isbrain(context):
             context = get(context)
+        plan = plan or self.plan()
+        profiling.count('points.computed')
         n = m = None
-        if (self._source_type() == MULTI_FORM_TYPE and
-                self.denominator_type != 'constant'):
-            n, m = self._mr_values(context)
+        if plan.ratio:
+            with profiling.timed('point.values'):
+                n, m = self._mr_values(context)
             divide = lambda a, b: float(a) / float(b) if b else NOVALUE
             if n is None or not m:
                 raw = NOVALUE
             else:
                 raw = divide(n, m)
-            normalized = self._normalize(raw)
+            with profiling.timed('point.normalize'):
+                normalized = plan.normalize(raw)
         else:
-            n, m = self._flex_values(context)
-            raw, normalized = self._values(context)
-        url = context.absolute_url()
-        if 'nohost' in url:
-            # in cases where a point is indexed in non-interactive session,
-            # we need a real URL to work with, assumes that 'site_url'
-            # property is set in portal_properties/site_properties
-            siteid, baseurl = self._base()
-            if baseurl:
-                url = url.replace('http://nohost/%s' % siteid, baseurl)
+            with profiling.timed('point.values'):
+                n, m = self._flex_values(context, plan)
+                raw, normalized = self._values(context, plan)
+        with profiling.timed('point.format'):
+            display_value = plan.format(normalized)
         point_record = {
             'title': context.Title(),
-            'url': url,
+            'url': self._point_url(context),
             'path': content_path(context),
             'start': context.start,
             'value': normalized,
             'raw_value': raw,
-            'display_value': self.display_format(normalized),
-            'user_notes': self.note_for(context),
+            'display_value': display_value,
+            'user_notes': self.note_for(context, plan),
         }
         if n is not None:
             point_record['raw_numerator'] = n
@@ -326,54 +333,133 @@ class MeasureDefinition(Item):
             point_record['raw_denominator'] = m
         return point_record
 
-    @ram.cache(datapoint_cache_key)
     def datapoint(self, context):
         """
         Returns dict for data point given form context, or
         given a catalog brain fronting for a form.
         """
-        cached = self._indexed_datapoint(context)
+        key = datapoint_cache_key(None, self, context)
+        cache = DataPointCache(self.site())
+        cached = cache.lookup(key)
         if cached:
+            cached['url'] = self._point_url(context)
             return cached
-        return self._datapoint(context)
+        point = self._datapoint(context)
+        cache.remember(key, point)
+        return point
 
     def points(self, seq):
         """
         Given iterable seq of form instance contexts, or catalog brains
         fronting for those context, return a list of datapoints for each.
         """
-        return [self.datapoint(context) for context in seq]
+        return self.points_batch(seq)
+
+    def _prefetch_queries(self):
+        """
+        Build (and cache) repoze.catalog queries for numerator and
+        denominator once, ahead of computing points for many forms.
+        """
+        if self._source_type() != MULTI_FORM_TYPE:
+            return
+        for name in ('numerator', 'denominator'):
+            if getattr(self, '%s_type' % name, None) == 'multi_filter':
+                self.get_query(name)
 
-    def _set_cumulative_points(self, point, previous):
+    def points_batch(self, seq):
         """
-        In place modification of point cumulative-to-present
-        based on previous sorted points.
+        Batch equivalent of datapoint() for many forms, brains, or form
+        UIDs: UIDs are resolved to brains in one catalog query; all
+        cached points are read using one cache component; forms for
+        remaining points are woken, and the state of any embedded
+        catalog of each is loaded, before points are computed re-using
+        the built queries and plan of this measure.  Returns list of
+        datapoints in the same order as seq, omitting any UIDs that do
+        not resolve to a form.
+        """
+        seq = list(seq)
+        uids = [spec for spec in seq if isinstance(spec, basestring)]
+        if uids:
+            brains = resolve_uids(uids, self.site(), objects=False)
+            seq = [
+                brains.get(str(spec)) if isinstance(spec, basestring)
+                else spec
+                for spec in seq
+                ]
+        result = [None] * len(seq)
+        cache = DataPointCache(self.site())
+        pending = []  # (index, key, form) tuples for uncached points
+        for index, context in enumerate(seq):
+            if context is None:
+                continue  # unresolvable UID
+            key = datapoint_cache_key(None, self, context)
+            cached = cache.lookup(key)
+            if cached:
+                cached['url'] = self._point_url(context)
+                result[index] = cached
+                continue
+            form = get(context) if isbrain(context) else context
+            catalog = getattr(aq_base(form), 'catalog', None)
+            activate = getattr(catalog, '_p_activate', None)
+            if activate is not None:
+                activate()  # load ghost of multi-record form catalog now
+            pending.append((index, key, form))
+        if pending:
+            self._prefetch_queries()
+            plan = self.plan()
+            for index, key, form in pending:
+                result[index] = self._datapoint(form, plan)
+                cache.remember(key, result[index])
+        return [point for point in result if point is not None]
+
+    # cumulative mode -> (point keys accumulated, user note suffix):
+    CUMULATIVE_MODES = {
+        'numerator': (('raw_numerator',), 'cumulative numerator'),
+        'denominator': (('raw_denominator',), 'cumulative denominator'),
+        'both': (
+            ('raw_numerator', 'raw_denominator'),
+            'cumulative numerator, denominator',
+            ),
+        'final': (('raw_value',), 'cumulative value'),
+        }
+
+    def _set_cumulative_points(self, points):
+        """
+        In place modification of sorted points, cumulative-to-present,
+        computed in a single running (prefix) scan per accumulated key.
         """
         mode = getattr(self, 'cumulative', '')
-        if not mode:
+        if mode not in self.CUMULATIVE_MODES:
             return  # not cumulative, no more work to do
+        keys, suffix = self.CUMULATIVE_MODES[mode]
+        plan = self.plan()
         opkey = getattr(self, 'cumulative_fn', 'SUM')
-        cfn = AGGREGATE_FUNCTIONS.get(opkey)
-        to_date = list(previous) + [point]
         _div = lambda a, b: float(a) / float(b) if b else NOVALUE
         divide = lambda a, b: NOVALUE if a is None or b is None else _div(a, b)
-        if mode == 'numerator':
-            key = 'raw_numerator'
-            values = filter(
-                lambda v: not math.isnan(v),
-                [p.get(key) for p in to_date],
-                )
-            cnum = point['cumulative_numerator'] = cfn(values)
-            val = point['value'] = self._normalize(
-                divide(cnum, point.get('raw_denominator'))
-                )
-            point['display_value'] = self.display_format(val)
-            point['user_notes'] = '%s%s' % (
+        accumulated = dict(
+            (key, running([p.get(key) for p in points], opkey))
+            for key in keys
+            )
+        for index, point in enumerate(points):
+            for key in keys:
+                name = key.replace('raw_', 'cumulative_')
+                point[name] = accumulated[key][index]
+            if mode == 'final':
+                cvalue = point['cumulative_value']
+                raw = NOVALUE if cvalue is None else cvalue
+            else:
+                n = point.get('raw_numerator')
+                m = point.get('raw_denominator')
+                raw = divide(
+                    point.get('cumulative_numerator', n),
+                    point.get('cumulative_denominator', m),
+                    )
+            val = point['value'] = plan.normalize(raw)
+            point['display_value'] = plan.format(val)
+            point['user_notes'] = '%s (%s)' % (
                 point.get('user_notes', '') or '',
-                ' (cumulative numerator)',
+                suffix,
                 )
-            
-        return  # TODO: denominator, both, final modes
 
     def _cumulative_points(self, seq):
         _start = lambda o: getattr(o, 'start', None)
@@ -386,28 +472,44 @@ class MeasureDefinition(Item):
             map(copy, self.points(seq)),
             key=lambda info: info.get('start', None),
             )  # sorted, un-normalized time-series of points
-        _previous_points = lambda idx: points[:idx]
-        for index, point in enumerate(points):
+        for point in points:
             point['cumulative_start'] = series_start
-            previous = _previous_points(index)
-            self._set_cumulative_points(point, previous)  # in-place
+        self._set_cumulative_points(points)  # in-place
         return points
 
-    def _dataset_points(self, dataset):
+    def _dataset_points(self, dataset, start=None, end=None, limit=None,
+                        offset=0, reverse=False):
         if getattr(dataset, 'use_aggregate', False):
             return []
-        brains = dataset.brains()
+        if getattr(self, 'cumulative', None):
+            # cumulative values need all points preceding the window:
+            brains = dataset.brains(end=end)
+            if not brains:
+                return []
+            points = self._cumulative_points(brains)
+            return _paged(_within(points, start), limit, offset, reverse)
+        if reverse and limit is not None:
+            brains = dataset.latest(limit, start, end, offset)
+        elif reverse:
+            brains = _paged(
+                dataset._python_sorted(dataset.brains(start, end)),
+                offset=offset,
+                reverse=True,
+                )
+        else:
+            brains = dataset.brains(start, end, limit, offset)
         if not brains:
             return []
-        if getattr(self, 'cumulative', None):
-            return self._cumulative_points(brains)
         return self.points(brains)
 
-    def _aggregate_dataset_points(self, aggregated, fn_name):
+    def _aggregate_dataset_points(self, aggregated, fn_name, granularity='',
+                                  start=None, end=None):
         """
         given a list of other aggregated datasets, get data for
         each, and calculate aggregate values for points, given
-        a value aggregation function (fn).
+        a value aggregation function (fn), per bucket of start dates
+        of given granularity (default: exact dates), optionally within
+        a start, end date window.
         """
         consider = lambda o: o is not None
         fn = AGGREGATE_FUNCTIONS.get(fn_name)
@@ -415,17 +517,10 @@ class MeasureDefinition(Item):
         result = []
         raw = []
         for ds in filter(consider, aggregated):
-            points = self._dataset_points(ds)
+            points = self._dataset_points(ds, start, end)
             raw.append(points)
-        all_points = list(chain(*raw))
-        _date = lambda info: info.get('start', None)
-        dates = sorted(set(map(_date, all_points)))  # de-duped ordered dates
-        for d in dates:
-            _hasvalue = lambda info: not math.isnan(info.get('value', NOVALUE))
-            _match = lambda info: info.get('start') == d and _hasvalue(info)
-            matches = filter(_match, all_points)
-            if not matches:
-                continue  # skip columns/dates for which no match found
+        all_points = chain(*raw)
+        for d, matches in group_points(all_points, granularity):
             values = [info.get('value') for info in matches]
             calculated_value = fn(values)
             if math.isnan(calculated_value):
@@ -445,11 +540,16 @@ class MeasureDefinition(Item):
                 })
         return result
 
-    def dataset_points(self, dataset):
+    def dataset_points(self, dataset, start=None, end=None, limit=None,
+                       offset=0, reverse=False):
         """
         Given an data set specification object providing the interface
         IFormDataSetSpecification, return data points for all forms
-        included in the set.
+        included in the set -- or only those within optional start, end
+        date window (narrowing any date range of the data set), paged
+        by limit and offset in order of start date.  If reverse is True,
+        limit and offset count back from the latest point (e.g. limit=6
+        for the latest six points); points remain in order of start.
         """
         try:
             if getattr(dataset, 'use_aggregate', False):
@@ -457,29 +557,44 @@ class MeasureDefinition(Item):
                 if aggregated:
                     aggregated = [uuidToObject(ds) for ds in aggregated]
                     fn_name = getattr(dataset, 'aggregate_function', 'AVG')
-                    return self._aggregate_dataset_points(aggregated, fn_name)
-            return self._dataset_points(dataset)
+                    granularity = getattr(
+                        dataset,
+                        'aggregate_granularity',
+                        '',
+                        )
+                    points = self._aggregate_dataset_points(
+                        aggregated,
+                        fn_name,
+                        granularity,
+                        start,
+                        end,
+                        )
+                    return _paged(points, limit, offset, reverse)
+            return self._dataset_points(
+                dataset,
+                start,
+                end,
+                limit,
+                offset,
+                reverse,
+                )
         except KeyError:
             # usually this is due to broken measure definition/query
             return []  # don't doom the whole barrel for one bad apple
 
-    def display_format(self, value):
+    def display_format(self, value, plan=None):
         """
         Format a value as a string using rules defined on measure
         definition.
         """
-        if math.isnan(value):
-            return 'N/A'
-        fmt = '%%.%if' % self.display_precision
-        if self.value_type == 'percentage' and self.multiplier == 100.0:
-            fmt += '%%'
-        return fmt % value
+        return (plan or self.plan()).format(value)
 
     def display_value(self, context):
         """
         Return string display value (formatted) for context.
         """
-        return self.display_format(self.value_for(context))
+        plan = self.plan()
+        return plan.format(self._values(context, plan)[1])
 
     def value_note(self, info):
         """
@@ -489,15 +604,16 @@ class MeasureDefinition(Item):
         note = u''
         if 'raw_numerator' in info and 'raw_denominator' in info:
             cumulative = info.get('cumulative_numerator', None)
-            if cumulative is not None:
-                op = getattr(self, 'cumulative_fn', 'SUM')
-                op = '+' if op == 'SUM' else ''
-                note += u'%s (%s%s) of %s' % (
-                    cumulative,
-                    op,
-                    info.get('raw_numerator'),
-                    info.get('raw_denominator'),
-                    )
+            cumulative_m = info.get('cumulative_denominator', None)
+            op = getattr(self, 'cumulative_fn', 'SUM')
+            op = '+' if op == 'SUM' else ''
+            if cumulative is not None or cumulative_m is not None:
+                n, m = info.get('raw_numerator'), info.get('raw_denominator')
+                if cumulative is not None:
+                    n = u'%s (%s%s)' % (cumulative, op, n)
+                if cumulative_m is not None:
+                    m = u'%s (%s%s)' % (cumulative_m, op, m)
+                note += u'%s of %s' % (n, m)
             else:
                 if self.denominator_type != 'constant':
                     note += u'%s of %s' % (
@@ -577,49 +693,102 @@ class FormDataSetSpecification(Item):
         spec = str(spec)
         return spec in (self.locations or ())
 
+    def _resolve_locations(self):
+        """
+        Resolve locations UIDs, in one catalog query, to a tuple of
+        paths of directly included forms and paths of included folders.
+        """
+        form_type = self._source_type()
+        catalog = getSite().portal_catalog
+        q = {'UID': {'query': list(self.locations), 'operator': 'or'}}
+        form_paths, folder_paths = [], []
+        for brain in catalog.unrestrictedSearchResults(q):
+            if brain.portal_type == form_type:
+                form_paths.append(brain.getPath())
+            else:
+                folder_paths.append(brain.getPath())
+        return (tuple(form_paths), tuple(folder_paths))
+
+    def _locations_key(self):
+        return (tuple(self.locations), self._source_type())
+
+    def update_resolved_locations(self):
+        """Store resolved locations, called when data set is modified"""
+        stored = getattr(aq_base(self), '_resolved_locations', None)
+        if stored:
+            unindex_location_paths(IUUID(self), sum(stored[1], ()))
+        if not getattr(self, 'locations', None):
+            self._resolved_locations = None
+            return
+        self._resolved_locations = (
+            self._locations_key(),
+            self._resolve_locations(),
+            )
+        index_location_paths(
+            IUUID(self),
+            sum(self._resolved_locations[1], ()),
+            )
+
+    def move_resolved_locations(self, oldpath, newpath):
+        """Re-write stored paths at or within oldpath, moved to newpath"""
+        key, resolved = self._resolved_locations
+        _moved = lambda p: newpath + p[len(oldpath):] if (
+            p == oldpath or p.startswith(oldpath + '/')) else p
+        unindex_location_paths(IUUID(self), sum(resolved, ()))
+        resolved = tuple(tuple(map(_moved, paths)) for paths in resolved)
+        self._resolved_locations = (key, resolved)
+        index_location_paths(IUUID(self), sum(resolved, ()))
+
+    def resolved_locations(self):
+        """
+        Tuple of (form paths, folder paths) for locations, as stored on
+        modification of data set (and maintained when locations move),
+        or as resolved by catalog query if locations changed since.
+        """
+        stored = getattr(aq_base(self), '_resolved_locations', None)
+        if stored and stored[0] == self._locations_key():
+            return stored[1]
+        return self._resolve_locations()
+
     def _path_query(self):
         form_type = self._source_type()
         spec_uids = getattr(self, 'locations', [])
         if not spec_uids:
             navroot = getNavigationRoot(self)
-            return {'portal_type': form_type, 'path': navroot}, []
-        # first use catalog to get brains for all matches to these
-        # UIDs where portal_type is form_type
-        catalog = getSite().portal_catalog
-        filter_q = {
-            'portal_type': form_type,
-            'UID': {
-                'query': spec_uids,
-                'operator': 'or',
-                },
-            }
-        form_uids = [
-            b.UID for b in catalog.unrestrictedSearchResults(filter_q)
-            ]
-        folder_uids = list(set(spec_uids).difference(form_uids))
-        folder_q = {'UID': {'query': folder_uids, 'operator': 'or'}}
-        folder_paths = [
-            b.getPath() for b in catalog.unrestrictedSearchResults(folder_q)
-            ]
-        path_q = {
+            return {'portal_type': form_type, 'path': navroot}
+        form_paths, folder_paths = self.resolved_locations()
+        # one path query for forms within folders, and the forms directly
+        # included (path index includes the object at each path):
+        return {
             'portal_type': form_type,
             'path': {
-                'query': folder_paths,
+                'query': list(folder_paths + form_paths),
                 'operator': 'or',
                 },
             }
-        return path_q, form_uids
 
-    def _query_spec(self):
+    def _window(self, start=None, end=None):
+        """
+        Effective (start, end) date range of forms: query_start and
+        query_end of data set, narrowed by any start, end dates given.
+        """
+        query_start = _as_date(getattr(self, 'query_start', None))
+        query_end = _as_date(getattr(self, 'query_end', None))
+        start, end = _as_date(start), _as_date(end)
+        if start and (not query_start or start > query_start):
+            query_start = start
+        if end and (not query_end or end < query_end):
+            query_end = end
+        return (query_start, query_end)
+
+    def _query_spec(self, start=None, end=None):
         idxmap = {
             'query_title': 'Title',
             'query_subject': 'Subject',
             'query_state': 'review_state',
         }
         q = {}
-        pathq, form_uids = self._path_query()
-        if pathq is not None:
-            q.update(pathq)  # include folder specified
+        q.update(self._path_query())  # included locations
         for name in idxmap:
             idx = idxmap[name]
             v = getattr(self, name, None)
@@ -632,42 +801,208 @@ class FormDataSetSpecification(Item):
             if v:
                 # only non-empty values are considered
                 q[idx] = v
-        if self.query_start and self.query_end:
+        query_start, query_end = self._window(start, end)
+        if query_start and query_end:
             q['start'] = {
-                'query': (DT(self.query_start), DT(self.query_end)),
+                'query': (DT(query_start), DT(query_end)),
                 'range': 'min:max',
                 }
-        if self.query_start and not self.query_end:
+        if query_start and not query_end:
             q['start'] = {
-                'query': DT(self.query_start),
+                'query': DT(query_start),
                 'range': 'min',
                 }
-        if self.query_end and not self.query_start:
+        if query_end and not query_start:
             q['start'] = {
-                'query': DT(self.query_end),
+                'query': DT(query_end),
                 'range': 'max',
                 }
-        return q, form_uids
+        return q
 
-    def brains(self):
-        folder_query, form_uids = self._query_spec()
+    def brains(self, start=None, end=None, limit=None, offset=0):
+        """
+        Brains for forms included, optionally within a (start, end)
+        date window narrowing the query of the data set, and paged by
+        limit and offset (in order of start date).
+        """
+        with profiling.timed('catalog.brains'):
+            return self._brains(start, end, limit, offset)
+
+    def _brains(self, start=None, end=None, limit=None, offset=0):
+        membership = membership_for(self) if MEMBERSHIP_ENABLED else None
+        if membership is not None:
+            uids = membership.uids(*self._window(start, end))
+            stop = None if limit is None else offset + limit
+            return self._member_brains(uids[offset:stop])
+        return self._query_brains(start, end, limit, offset)
+
+    def _member_brains(self, uids):
+        """Brains for UIDs of forms in membership, ordered as UIDs"""
+        if not uids:
+            return []
         catalog = getSite().portal_catalog
-        directly_specified = catalog.unrestrictedSearchResults({
-            'UID': {'query': form_uids, 'operator': 'or'},
-            })
-        forms_in_folders_specified = catalog.unrestrictedSearchResults(
-            folder_query
+        q = {'UID': {'query': uids, 'operator': 'or'}}
+        order = dict((uid, idx) for idx, uid in enumerate(uids))
+        return sorted(
+            catalog.unrestrictedSearchResults(q),
+            key=lambda brain: order.get(brain.UID),
             )
-        # get a LazyCat (concatenation of two results):
-        unsorted_result = directly_specified + forms_in_folders_specified
-        # might as well get all the results into list instead of LazyCat:
-        unsorted_result = list(unsorted_result)
-        if not getattr(self, 'sort_on_start', False):
-            return unsorted_result
+
+    def _search(self, sort=False, reverse=False, limit=None, **window):
+        """
+        Catalog search for forms matching live query of data set, within
+        optional start, end window; optionally sorted by catalog on start
+        date (reverse for latest first), limited to first limit results.
+        """
+        query = self._query_spec(**window)
+        path = query['path']
+        if isinstance(path, dict) and not path['query']:
+            return []  # no included location resolves
+        if sort:
+            query['sort_on'] = 'start'
+        if reverse:
+            query['sort_order'] = 'reverse'
+        if limit:
+            query['sort_limit'] = limit
+        catalog = getSite().portal_catalog
+        return catalog.unrestrictedSearchResults(query)
+
+    def _python_sorted(self, brains):
         _keyfn = lambda brain: getattr(brain, 'start', None)
-        return sorted(unsorted_result, key=_keyfn)
+        return sorted(brains, key=_keyfn)
+
+    def _query_brains(self, start=None, end=None, limit=None, offset=0):
+        """Brains for forms matching live query of data set"""
+        window = {'start': start, 'end': end}
+        paged = limit is not None or offset
+        if not paged and not getattr(self, 'sort_on_start', False):
+            return list(self._search(**window))  # single query, unique
+        stop = None if limit is None else offset + limit
+        # not limited by sort_limit: forms without start date, which sort
+        # first, are omitted from results sorted on the start index, and
+        # a limited result would not show any were omitted:
+        result = self._search(sort=True, **window)
+        if len(result) < _result_count(result):
+            # sort all in Python instead:
+            result = self._python_sorted(self._search(**window))
+        return list(result[offset:stop]) if paged else result
+
+    def latest(self, n, start=None, end=None, offset=0):
+        """
+        Brains for the latest n forms by start date (after skipping the
+        offset latest), optionally within start, end date window, in
+        order of start; only (about) offset + n brains are loaded from
+        the catalog.
+        """
+        if n <= 0:
+            return []
+        membership = membership_for(self) if MEMBERSHIP_ENABLED else None
+        if membership is not None:
+            uids = membership.uids(*self._window(start, end))
+            return self._member_brains(_paged(uids, n, offset, True))
+        window = {'start': start, 'end': end}
+        stop = offset + n
+        result = self._search(sort=True, reverse=True, limit=stop, **window)
+        if len(result) < min(stop, _result_count(result)):
+            ordered = self._python_sorted(self._search(**window))
+            return _paged(ordered, n, offset, True)
+        return list(reversed(list(result[offset:stop])))
 
     def forms(self):
         r = self.brains()
         return [get(b) for b in r]
 
+
+def _within(points, start):
+    """Points starting on or after start date (if any)"""
+    if not start:
+        return points
+    start = _as_date(start)
+    _start = lambda point: _as_date(point.get('start', None))
+    return [
+        point for point in points
+        if _start(point) is not None and _start(point) >= start
+        ]
+
+
+def _paged(points, limit=None, offset=0, reverse=False):
+    """
+    Page of sequence ordered by start date; if reverse, limit and offset
+    count back from the end (latest), page remains in order.
+    """
+    if not reverse:
+        stop = None if limit is None else offset + limit
+        return points[offset:stop]
+    stop = max(0, len(points) - offset)
+    begin = 0 if limit is None else max(0, stop - limit)
+    return points[begin:stop]
+
+
+def _result_count(result):
+    """Count of all matches for (possibly sorted, limited) catalog result"""
+    return getattr(result, 'actual_result_count', None) or len(result)
+
+
+# site-wide index of stored location paths to data set UIDs, so that
+# moves can update resolved locations of only affected data sets:
+
+LOCATION_PATHS_KEY = 'uu.formlibrary.location_paths'
+
+
+def _location_paths(site, create=False):
+    anno = IAnnotations(site)
+    if LOCATION_PATHS_KEY not in anno and create:
+        anno[LOCATION_PATHS_KEY] = OOBTree()
+    return anno.get(LOCATION_PATHS_KEY, None)
+
+
+def index_location_paths(uid, paths):
+    index = _location_paths(getSite(), create=True)
+    for path in paths:
+        if path not in index:
+            index[path] = OOTreeSet()
+        index[path].insert(uid)
+
+
+def unindex_location_paths(uid, paths):
+    index = _location_paths(getSite())
+    if index is None:
+        return
+    for path in paths:
+        uids = index.get(path)
+        if uids is not None and uid in uids:
+            uids.remove(uid)
+            if not len(uids):
+                del index[path]
+
+
+def handle_content_moved(context, event):
+    """
+    Update stored resolved locations of data sets including moved (or
+    renamed) content, or content within it, by path.
+    """
+    if event.oldParent is None or event.newParent is None:
+        return  # added or removed, not moved: resolved paths still valid
+    site = getSite()
+    index = _location_paths(site) if site is not None else None
+    if not index:
+        return
+    oldpath = '/'.join(event.oldParent.getPhysicalPath() + (event.oldName,))
+    newpath = '/'.join(event.newParent.getPhysicalPath() + (event.newName,))
+    # keys at oldpath or within; range bound '0' follows '/' in ASCII:
+    paths = [
+        p for p in index.keys(oldpath, oldpath + '0')
+        if p == oldpath or p.startswith(oldpath + '/')
+        ]
+    uids = set(chain(*[index[p] for p in paths]))
+    for uid in uids:
+        dataset = get(uid, site)
+        if dataset is None or not getattr(
+                aq_base(dataset), '_resolved_locations', None):
+            unindex_location_paths(uid, paths)  # removed data set
+            continue
+        dataset.move_resolved_locations(oldpath, newpath)
+
+
+def handle_dataset_modify(context, event):
+    context.update_resolved_locations()
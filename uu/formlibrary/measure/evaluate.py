@@ -0,0 +1,257 @@
+"""
+uu-formlibrary-evaluate -- site-wide measure evaluation (data point cache
+reload), sharding measures of each site across worker processes.
+
+Usage:
+
+  bin/uu-formlibrary-evaluate -C parts/instance/etc/zope.conf \\
+      -j 8 'qi*' opip
+
+Each worker process opens its own ZODB connection, reloads cached data
+points for its share of the measures of each matching Plone site (with
+this product installed), and commits after each batch of measures;
+changes made by a measure that fails to reload are rolled back.  The
+definition index of each site is built (if needed) before workers
+start.  A summary of timing, failures, and points computed is printed
+at the end.
+"""
+
+import argparse
+from fnmatch import fnmatch
+import multiprocessing
+import sys
+import time
+
+
+PKGNAME = 'uu.formlibrary'
+
+# attempts at committing a batch before giving up on it:
+RETRIES = 3
+
+
+def _product_installed(site):
+    qi = getattr(site, 'portal_quickinstaller', None)
+    return qi is not None and qi.isProductInstalled(PKGNAME)
+
+
+def _open_app(config):
+    import Zope2
+    from Testing.makerequest import makerequest
+    Zope2.configure(config)
+    return makerequest(Zope2.app())
+
+
+def _sites(app, patterns):
+    return [
+        site for site in app.objectValues('Plone Site')
+        if any(fnmatch(site.getId(), pattern) for pattern in patterns) and
+        _product_installed(site)
+        ]
+
+
+def _measure_uids(site):
+    from uu.formlibrary.measure.interfaces import MEASURE_DEFINITION_TYPE
+    catalog = site.portal_catalog
+    brains = catalog.unrestrictedSearchResults(
+        {'portal_type': MEASURE_DEFINITION_TYPE}
+        )
+    return sorted(brain.UID for brain in brains)
+
+
+def _commit(site, msg):
+    import transaction
+    txn = transaction.get()
+    txn.note('%s -- for %s' % (msg, '/'.join(site.getPhysicalPath())))
+    txn.commit()
+
+
+def _reload_batch(cache, site, uids, stats):
+    """Reload, commit batch of measure UIDs, retrying on conflict"""
+    import transaction
+    from ZODB.POSException import ConflictError
+    for attempt in range(RETRIES):
+        points, failed = 0, []
+        try:
+            for uid in uids:
+                # reload may fail after invalidating or storing some points
+                # for the measure; roll back to before it, not commit those:
+                savepoint = transaction.savepoint()
+                try:
+                    points += cache.reload(uid) or 0
+                except ConflictError:
+                    raise
+                except Exception:
+                    failed.append((uid, repr(sys.exc_info()[1])))
+                    savepoint.rollback()
+            _commit(site, 'Reloaded data points for %s measures' % len(uids))
+            stats['points'] += points
+            stats['measures'] += len(uids) - len(failed)
+            stats['failures'].extend(failed)
+            return
+        except ConflictError:
+            transaction.abort()
+            stats['conflicts'] += 1
+    stats['failures'].extend(
+        (uid, 'ConflictError (retries exhausted)') for uid in uids
+        )
+
+
+def _login(app, options):
+    from AccessControl.SecurityManagement import newSecurityManager
+    user = app.acl_users.getUser(options['user'])
+    newSecurityManager(None, user)
+
+
+def build_indexes(options):
+    """
+    Worker process entry, run once before shards are evaluated: build
+    the definition index of each matching site where not yet built, so
+    that shard workers do not all build (and conflict on) it at once.
+    Returns list of ids of sites with newly built index.
+    """
+    import transaction
+    from zope.component.hooks import setSite
+    from uu.formlibrary.measure.cache import DefinitionIndex
+    built = []
+    app = _open_app(options['config'])
+    _login(app, options)
+    for site in _sites(app, options['sites']):
+        setSite(site)
+        index = DefinitionIndex(site)
+        if not index.built:
+            index.rebuild()
+            _commit(site, 'Built definition index')
+            built.append(site.getId())
+        transaction.abort()
+        setSite(None)
+    app._p_jar.close()
+    return built
+
+
+def evaluate_shard(options):
+    """
+    Worker process entry: reload data points for measures in shard
+    (worker index of count) of each matching site; returns stats dict.
+    """
+    from zope.component.hooks import setSite
+    from uu.formlibrary.measure.cache import DataPointCache
+    index, count = options['index'], options['workers']
+    batch_size = options['batch_size']
+    stats = {
+        'worker': index,
+        'sites': [],
+        'measures': 0,
+        'points': 0,
+        'conflicts': 0,
+        'failures': [],
+        }
+    started = time.time()
+    app = _open_app(options['config'])
+    _login(app, options)
+    for site in _sites(app, options['sites']):
+        setSite(site)
+        stats['sites'].append(site.getId())
+        cache = DataPointCache(site)
+        uids = _measure_uids(site)[index::count]
+        for idx in range(0, len(uids), batch_size):
+            _reload_batch(cache, site, uids[idx:idx + batch_size], stats)
+        setSite(None)
+    app._p_jar.close()
+    stats['seconds'] = time.time() - started
+    return stats
+
+
+def summarize(results, elapsed):
+    sites = sorted(set(sum([r['sites'] for r in results], [])))
+    print '== Evaluated sites: %s' % ', '.join(sites)
+    for r in sorted(results, key=lambda r: r['worker']):
+        print '\t worker %s: %s measures, %s points, %s conflicts, ' \
+              '%s failures in %.1fs' % (
+                  r['worker'],
+                  r['measures'],
+                  r['points'],
+                  r['conflicts'],
+                  len(r['failures']),
+                  r['seconds'],
+                  )
+    failures = sum([r['failures'] for r in results], [])
+    for uid, msg in failures:
+        print '\t FAILED: measure %s -- %s' % (uid, msg)
+    print '== Total: %s measures, %s points, %s failures in %.1fs' % (
+        sum(r['measures'] for r in results),
+        sum(r['points'] for r in results),
+        len(failures),
+        elapsed,
+        )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Reload cached measure data points for Plone sites, '
+                    'sharding measures across worker processes.',
+        )
+    parser.add_argument(
+        'sites',
+        nargs='*',
+        default=['*'],
+        help='Plone site ids or glob patterns (default: all sites)',
+        )
+    parser.add_argument(
+        '-C', '--config',
+        required=True,
+        help='path to zope.conf of a (ZEO client) instance',
+        )
+    parser.add_argument(
+        '-j', '--workers',
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help='worker processes (default: CPU count)',
+        )
+    parser.add_argument(
+        '-b', '--batch-size',
+        type=int,
+        default=10,
+        help='measures reloaded per committed batch (default: 10)',
+        )
+    parser.add_argument(
+        '-u', '--user',
+        default='admin',
+        help='id of user in application root user folder (default: admin)',
+        )
+    args = parser.parse_args(argv)
+    workers = max(1, args.workers)
+    shards = [
+        {
+            'index': index,
+            'workers': workers,
+            'config': args.config,
+            'sites': args.sites,
+            'batch_size': max(1, args.batch_size),
+            'user': args.user,
+        }
+        for index in range(workers)
+        ]
+    started = time.time()
+    # workers configure Zope and open the database only after fork; the
+    # definition index is built first, once, in its own worker process:
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        built = pool.apply(build_indexes, (shards[0],))
+    finally:
+        pool.close()
+        pool.join()
+    if built:
+        print '== Built definition index for: %s' % ', '.join(built)
+    pool = multiprocessing.Pool(workers, maxtasksperchild=1)
+    try:
+        results = pool.map(evaluate_shard, shards, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    failures = summarize(results, time.time() - started)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
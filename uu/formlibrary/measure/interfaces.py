@@ -87,12 +87,20 @@ ROUNDING_CHOICES = SimpleVocabulary([
 CUMULATIVE_CHOICES = SimpleVocabulary([
     SimpleTerm('', title=u'Not cumulative'),
     SimpleTerm('numerator', title=u'Apply to computed numerator'),
-    #SimpleTerm('denominator', title=u'Apply to computed denominator.'),
-    #SimpleTerm(
-    #    'both',
-    #    title=u'Apply to both numerator, denominator respectively.',
-    #    ),
-    #SimpleTerm('final', title=u'Apply to final value for each period.'),
+    SimpleTerm('denominator', title=u'Apply to computed denominator.'),
+    SimpleTerm(
+        'both',
+        title=u'Apply to both numerator, denominator respectively.',
+        ),
+    SimpleTerm('final', title=u'Apply to final value for each period.'),
+])
+
+
+AGGREGATE_GRANULARITY_CHOICES = SimpleVocabulary([
+    SimpleTerm('', title=u'Exact start date'),
+    SimpleTerm('month', title=u'Calendar month'),
+    SimpleTerm('quarter', title=u'Calendar quarter'),
+    SimpleTerm('isoweek', title=u'ISO week (Monday start)'),
 ])
 
 
@@ -488,11 +496,25 @@ class IMeasureDefinition(form.Schema,
         sort order.
         """
 
-    def dataset_points(dataset):
+    def points_batch(seq):
+        """
+        Given a sequence of form instances, catalog brains for
+        form instances, or form UIDs, get data-point for each,
+        preserving sort order; cached points are read, and remaining
+        points are computed, in batch for efficiency with large
+        sequences.  UIDs that do not resolve to a form are omitted.
+        """
+
+    def dataset_points(dataset, start=None, end=None, limit=None, offset=0,
+                       reverse=False):
         """
         Given a topic/collection object, get all form instances
         matching that topic, and get a data-point for each,
         preserving sort order.
+
+        Optional start, end dates narrow the date range of the data
+        set; limit and offset page points in order of start date, or
+        if reverse is True, counting back from the latest point.
         """
 
     def value_note(info):
@@ -549,6 +571,7 @@ class IFormDataSetSpecification(form.Schema):
             'use_aggregate',
             'aggregate_datasets',
             'aggregate_function',
+            'aggregate_granularity',
             ]
         )
 
@@ -654,8 +677,31 @@ class IFormDataSetSpecification(form.Schema):
         default='AVG',
         )
 
-    def brains(self):
-        """Return an iterable of catalog brains for forms included."""
+    aggregate_granularity = schema.Choice(
+        title=u'Aggregate by',
+        description=u'Group points of aggregated data-sets by exact '
+                    u'start date, or by the calendar period containing '
+                    u'the start date of each form (to roll up forms '
+                    u'of differing frequency).',
+        vocabulary=AGGREGATE_GRANULARITY_CHOICES,
+        default='',
+        required=False,
+        )
+
+    def brains(self, start=None, end=None, limit=None, offset=0):
+        """
+        Return an iterable of catalog brains for forms included,
+        optionally within start, end date window (narrowing the date
+        range of the data set), paged by limit and offset in order of
+        start date.
+        """
+
+    def latest(self, n, start=None, end=None, offset=0):
+        """
+        Return list of catalog brains for the latest n forms included,
+        by start date (after skipping offset latest forms), optionally
+        within start, end date window, ordered by start date.
+        """
 
     def forms(self):
         """Return an iterable of form objects included."""
@@ -734,6 +780,19 @@ class IDataPointCache(IIterableMapping, IWriteMapping):
 
     def __setitem__(key, value):
         """Alterate spelling for store(); validates accordingly."""
+
+    def enqueue(uid):
+        """
+        Given UID of either a measure or a form, queue the UID for
+        deferred reload (see process_queue()).
+        """
+
+    def process_queue(batch_size=20, commit=None):
+        """
+        Reload all UIDs queued for deferred reload, in batches, and
+        return the number of UIDs reloaded.  If commit is provided, it
+        is called as commit(site, message) after each batch.
+        """
     
     def __delitem__(key):
         """
@@ -0,0 +1,78 @@
+import cPickle
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """
+    Bounded, thread-safe, per-process least-recently-used mapping,
+    limited by count of entries (maxsize) and optionally by approximate
+    pickled size of values in bytes (maxbytes).  Values should be
+    immutable (e.g. tuples), as they are shared by all threads.
+
+    Keeps hit, miss, and eviction counters, see stats().
+    """
+
+    def __init__(self, maxsize=1000, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def _sizeof(self, value):
+        if not self.maxbytes:
+            return 0
+        return len(cPickle.dumps(value, 2))
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value  # re-insert as most recently used
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                del(self._data[key])
+                self.bytes -= self._sizes.pop(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            while self._data and (
+                    len(self._data) > self.maxsize or
+                    (self.maxbytes and self.bytes > self.maxbytes)):
+                evicted, _ = self._data.popitem(last=False)  # oldest
+                self.bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'bytes': self.bytes,
+            'maxsize': self.maxsize,
+            'maxbytes': self.maxbytes,
+            }
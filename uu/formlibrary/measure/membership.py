@@ -0,0 +1,335 @@
+"""
+Optional materialized membership of data sets: for each data set, a
+persistent set of (start ordinal, UID) for included forms, maintained by
+form add/move/remove, modify, and workflow transition events, so that
+FormDataSetSpecification.brains() need not re-run the full data set
+query.  Opt-in: UU_FORMLIBRARY_DATASET_MEMBERSHIP=on
+
+Form events are matched against criteria of each data set in Python;
+scripts/dataset_membership_verify.py compares stored membership with
+the live catalog query (and with --repair, builds missing memberships).
+Memberships are only written by event handlers (and that script), never
+when read: a data set without current membership uses its live query.
+Data sets filtered by title are never materialized (see materialized()).
+"""
+
+import datetime
+
+import transaction
+
+from Acquisition import aq_base
+from BTrees.OOBTree import OOBTree, OOTreeSet
+from persistent import Persistent
+from plone.app.layout.navigation.root import getNavigationRoot
+from plone.uuid.interfaces import IUUID
+from zope.annotation.interfaces import IAnnotations
+from zope.component.hooks import getSite
+
+from uu.formlibrary.interfaces import IBaseForm
+from uu.formlibrary.utils import env_flag
+from utils import get
+
+
+MEMBERSHIP_ENABLED = env_flag('UU_FORMLIBRARY_DATASET_MEMBERSHIP')
+
+ANNO_KEY = 'uu.formlibrary.dataset_membership'
+
+
+def _date(v):
+    """date for date, datetime, or DateTime value (or None)"""
+    if hasattr(v, 'asdatetime'):
+        v = v.asdatetime()  # DateTime
+    if isinstance(v, datetime.datetime):
+        return v.date()
+    return v
+
+
+def _ordinal(v):
+    """Sort key for start date, forms without start sort first"""
+    v = _date(v)
+    return v.toordinal() if v is not None else 0
+
+
+def start_key(form):
+    return _ordinal(getattr(aq_base(form), 'start', None))
+
+
+def _state_query(v):
+    """Hashable query_state: None (exclude private) is not [] (any)"""
+    return tuple(v) if v is not None else None
+
+
+def materialized(dataset):
+    """
+    Can membership of data set be materialized?  Not for a data set
+    filtered by title: the Title index text of a form includes the
+    title of its parent (see forms.title_indexer), which changes without
+    any event on the form, and query_title is ZCTextIndex query syntax
+    (and/or/not, phrases, globs), so only the live query matches it.
+    """
+    return not getattr(dataset, 'query_title', None)
+
+
+def criteria_key(dataset):
+    """Key of data set criteria; membership is invalid if key changes"""
+    _get = lambda name: getattr(dataset, name, None)
+    return (
+        tuple(_get('locations') or ()),
+        dataset._source_type(),
+        _get('query_title'),
+        tuple(_get('query_subject') or ()),
+        _state_query(_get('query_state')),
+        _get('query_start'),
+        _get('query_end'),
+        )
+
+
+class DatasetMembership(Persistent):
+    """
+    Forms included in one data set, as OOTreeSet of (start ordinal, UID)
+    tuples (ordered by start), with the criteria used to match forms.
+    """
+
+    def __init__(self, dataset):
+        self.members = OOTreeSet()
+        self.positions = OOBTree()  # UID -> start ordinal
+        self.stale = False
+        self.criteria(dataset)
+
+    def criteria(self, dataset):
+        """Copy (resolved) match criteria from data set"""
+        _get = lambda name: getattr(dataset, name, None)
+        self.key = criteria_key(dataset)
+        self.form_type = dataset._source_type()
+        locations = tuple(_get('locations') or ())
+        self.direct = frozenset(locations)
+        if locations:
+            self.folder_paths = dataset.resolved_locations()[1]
+        else:
+            self.folder_paths = (getNavigationRoot(dataset),)
+        self.subjects = frozenset(_get('query_subject') or ())
+        # None excludes private forms, empty list (default) any state, as
+        # for FormDataSetSpecification._query_spec():
+        self.states = _state_query(_get('query_state'))
+        self.start = _date(_get('query_start'))
+        self.end = _date(_get('query_end'))
+
+    def _within(self, path):
+        return any(
+            path == base or path.startswith(base.rstrip('/') + '/')
+            for base in self.folder_paths
+            )
+
+    def matches(self, form, uid, state):
+        """Does form (with UID, workflow state) meet data set criteria?"""
+        if getattr(form, 'portal_type', None) != self.form_type:
+            return False
+        path = '/'.join(form.getPhysicalPath())
+        if uid not in self.direct and not self._within(path):
+            return False
+        if self.subjects and not self.subjects & set(form.Subject()):
+            return False
+        if self.states is None and state in (None, 'private'):
+            return False  # unset query_state excludes private
+        if self.states and state not in self.states:
+            return False
+        start = _date(getattr(aq_base(form), 'start', None))
+        if self.start or self.end:
+            if start is None:
+                return False
+            if self.start and start < self.start:
+                return False
+            if self.end and start > self.end:
+                return False
+        return True
+
+    def add(self, uid, key):
+        """Add or re-position UID, returns True if changed"""
+        existing = self.positions.get(uid)
+        if existing == key:
+            return False
+        if existing is not None:
+            self.members.remove((existing, uid))
+        self.members.insert((key, uid))
+        self.positions[uid] = key
+        return True
+
+    def discard(self, uid):
+        """Remove UID if member, returns True if changed"""
+        existing = self.positions.get(uid)
+        if existing is None:
+            return False
+        self.members.remove((existing, uid))
+        del self.positions[uid]
+        return True
+
+    def update(self, form, uid, state):
+        if self.matches(form, uid, state):
+            return self.add(uid, start_key(form))
+        return self.discard(uid)
+
+    def uids(self, start=None, end=None):
+        """
+        Member UIDs, ordered by form start date, optionally only for
+        forms starting within (inclusive) start, end dates.
+        """
+        if start is None and end is None:
+            return [uid for key, uid in self.members]
+        low = (_ordinal(start),) if start is not None else None
+        high = (_ordinal(end) + 1,) if end is not None else None
+        members = self.members.keys(low, high, excludemax=True)
+        # forms without start (key 0) are excluded from any window:
+        return [uid for key, uid in members if key]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, uid):
+        return uid in self.positions
+
+
+def registry(site=None, create=False):
+    """Site-wide OOBTree of data set UID to DatasetMembership, or None"""
+    site = site if site is not None else getSite()
+    if site is None:
+        return None
+    anno = IAnnotations(site)
+    if ANNO_KEY not in anno and create:
+        anno[ANNO_KEY] = OOBTree()
+    return anno.get(ANNO_KEY, None)
+
+
+def rebuild(dataset, site=None):
+    """
+    Build (or rebuild) membership for data set from live query; returns
+    None (removing any membership) if data set is not materialized.
+    """
+    if not materialized(dataset):
+        reg = registry(site)
+        uid = IUUID(dataset, None)
+        if reg is not None and uid in reg:
+            del reg[uid]
+        return None
+    membership = DatasetMembership(dataset)
+    for brain in dataset._query_brains():
+        membership.add(brain.UID, _ordinal(getattr(brain, 'start', None)))
+    registry(site, create=True)[IUUID(dataset)] = membership
+    return membership
+
+
+def membership_for(dataset):
+    """
+    Current membership for data set, or None if missing, stale, or if
+    the data set criteria have changed since it was built.  Does not
+    write: callers should use the live query of the data set for None.
+    """
+    if not materialized(dataset):
+        return None
+    uid = IUUID(dataset, None)
+    reg = registry()
+    membership = reg.get(uid) if reg is not None and uid else None
+    if membership is None or membership.stale:
+        return None
+    if membership.key != criteria_key(dataset):
+        return None
+    return membership
+
+
+def rebuild_stale(site):
+    """Rebuild all stale memberships of site (before-commit hook)"""
+    reg = registry(site)
+    if not reg:
+        return
+    for uid, membership in list(reg.items()):
+        if not membership.stale:
+            continue
+        dataset = get(uid, site)
+        if dataset is None:
+            del reg[uid]
+            continue
+        rebuild(dataset, site)
+
+
+def _schedule_rebuild(site):
+    """
+    Rebuild stale memberships at commit, once the catalog reflects the
+    move (event subscribers run in no guaranteed order).
+    """
+    txn = transaction.get()
+    hooks = txn.getBeforeCommitHooks()
+    if any(hook is rebuild_stale for hook, args, kwargs in hooks):
+        return
+    txn.addBeforeCommitHook(rebuild_stale, (site,))
+
+
+def _state(form):
+    wftool = getattr(getSite(), 'portal_workflow', None)
+    if wftool is None:
+        return None
+    return wftool.getInfoFor(form, 'review_state', None)
+
+
+def update_form(form, removed=False):
+    """Add, re-position, or remove form in all data set memberships"""
+    reg = registry()
+    if not reg:
+        return
+    uid = IUUID(form, None)
+    if uid is None:
+        return
+    state = None if removed else _state(form)
+    for membership in reg.values():
+        if membership.stale:
+            continue  # rebuilt from live query at commit
+        if removed:
+            membership.discard(uid)
+        else:
+            membership.update(form, uid, state)
+
+
+# event subscribers:
+
+def handle_form_moved(context, event):
+    """Form added, moved, renamed, or removed"""
+    update_form(context, removed=event.newParent is None)
+
+
+def handle_form_changed(context, event):
+    """Form modified or transitioned"""
+    update_form(context)
+
+
+def handle_content_moved(context, event):
+    """
+    Folder (not form) moved or renamed: mark stale memberships of data
+    sets including forms within the folder by path, to be rebuilt from
+    the live query when the transaction commits.
+    """
+    if IBaseForm.providedBy(context):
+        return
+    if event.oldParent is None or event.newParent is None:
+        return
+    reg = registry()
+    if not reg:
+        return
+    oldpath = '/'.join(event.oldParent.getPhysicalPath() + (event.oldName,))
+    for membership in reg.values():
+        if membership.stale:
+            continue
+        if any(
+                path == oldpath or path.startswith(oldpath + '/')
+                for path in membership.folder_paths):
+            membership.stale = True
+            _schedule_rebuild(getSite())
+
+
+def handle_dataset_modify(context, event):
+    if MEMBERSHIP_ENABLED:
+        rebuild(context)
+
+
+def handle_dataset_removed(context, event):
+    reg = registry()
+    uid = IUUID(context, None)
+    if reg is not None and uid in reg:
+        del reg[uid]
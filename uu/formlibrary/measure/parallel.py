@@ -0,0 +1,126 @@
+# concurrent evaluation of data set points, one ZODB connection per worker
+
+from multiprocessing.pool import ThreadPool
+import os
+
+from Acquisition import aq_base, aq_inner, aq_parent
+from AccessControl.SecurityManagement import getSecurityManager
+from AccessControl.SecurityManagement import newSecurityManager
+from AccessControl.SecurityManagement import noSecurityManager
+from Testing.makerequest import makerequest
+import transaction
+from zope.component.hooks import getSite, setSite
+from zope.globalrequest import getRequest, setRequest, clearRequest
+
+
+# number of worker threads for data set evaluation; 0 or 1 is serial:
+PARALLEL_WORKERS = int(
+    os.environ.get('UU_FORMLIBRARY_PARALLEL_DATASETS', '0').strip() or 0
+    )
+
+
+def _path(o):
+    return '/'.join(o.getPhysicalPath())
+
+
+def _url_settings(request):
+    """Server URL and virtual hosting settings of (calling) request"""
+    if request is None:
+        return None
+    return {
+        'SERVER_URL': request.get('SERVER_URL'),
+        'script': list(getattr(request, '_script', [])),
+        'VirtualRootPhysicalPath': request.get('VirtualRootPhysicalPath'),
+        }
+
+
+def _apply_url_settings(request, settings):
+    """
+    Make URLs generated in worker (e.g. absolute_url() of forms for
+    points) match those of the calling request, not http://foo
+    """
+    if not settings or not settings['SERVER_URL']:
+        return
+    request.other['SERVER_URL'] = settings['SERVER_URL']
+    request._script = list(settings['script'])
+    vrpp = settings['VirtualRootPhysicalPath']
+    if vrpp is not None:
+        request.other['VirtualRootPhysicalPath'] = vrpp
+    request._resetURLS()
+
+
+class DatasetWorker(object):
+    """
+    Callable computing data set points for one data set (by path) in a
+    worker thread, using its own connection opened from the database of
+    the measure, and (read-only) discarding any changes on completion.
+    """
+
+    def __init__(self, measure):
+        self.db = measure._p_jar.db()
+        self.measure_path = _path(measure)
+        self.site_path = _path(getSite())
+        self.url_settings = _url_settings(getRequest())
+        user = getSecurityManager().getUser()
+        self.user_id = user.getId()
+        # only non-persistent users (e.g. PAS users, special users) may be
+        # shared across threads; persistent users are looked up again in
+        # the connection of each worker:
+        self.user = None
+        if getattr(aq_base(user), '_p_jar', None) is None:
+            self.user = aq_base(user)
+        userfolder = aq_parent(aq_inner(user))
+        self.userfolder_path = None
+        if userfolder is not None and hasattr(userfolder, 'getPhysicalPath'):
+            self.userfolder_path = _path(userfolder)
+
+    def _login(self, app):
+        if self.userfolder_path is None:
+            return
+        userfolder = app.unrestrictedTraverse(self.userfolder_path)
+        user = None
+        if self.user_id is not None:
+            user = userfolder.getUserById(self.user_id)
+        if user is None:
+            user = self.user
+        if user is None:
+            return  # anonymous
+        newSecurityManager(None, aq_base(user).__of__(userfolder))
+
+    def __call__(self, dataset_path):
+        conn = self.db.open()
+        try:
+            app = makerequest(conn.root()['Application'])
+            _apply_url_settings(app.REQUEST, self.url_settings)
+            setRequest(app.REQUEST)
+            setSite(app.unrestrictedTraverse(self.site_path))
+            self._login(app)
+            measure = app.unrestrictedTraverse(self.measure_path)
+            dataset = app.unrestrictedTraverse(dataset_path)
+            return measure.dataset_points(dataset)
+        finally:
+            transaction.abort()
+            noSecurityManager()
+            setSite(None)
+            clearRequest()
+            conn.close()
+
+
+def parallel_dataset_points(measure, datasets, workers=None):
+    """
+    Return list of dataset_points() results for measure, one for each
+    of datasets, in dataset order.  If workers (default: configured
+    PARALLEL_WORKERS) is more than one, data sets are evaluated
+    concurrently in a thread pool, otherwise serially.
+    """
+    datasets = list(datasets)
+    workers = PARALLEL_WORKERS if workers is None else workers
+    workers = min(workers, len(datasets))
+    if workers <= 1 or getattr(measure, '_p_jar', None) is None:
+        return [measure.dataset_points(dataset) for dataset in datasets]
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(DatasetWorker(measure), map(_path, datasets))
+    finally:
+        pool.close()
+        pool.join()
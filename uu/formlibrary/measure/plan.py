@@ -0,0 +1,147 @@
+from copy import deepcopy
+import math
+import os
+
+from plone.uuid.interfaces import IUUID
+from zope.component import queryAdapter
+
+from uu.formlibrary.interfaces import MULTI_FORM_TYPE
+from uu.formlibrary.search.interfaces import IComposedQuery
+from lru import LRUCache
+
+
+PLAN_CACHE = LRUCache(
+    maxsize=int(os.environ.get('UU_FORMLIBRARY_PLAN_CACHE_SIZE', 1000)),
+    )
+
+# built repoze.catalog queries, by measure and query name:
+QUERY_CACHE = LRUCache(
+    maxsize=int(os.environ.get('UU_FORMLIBRARY_QUERY_CACHE_SIZE', 2000)),
+    )
+
+# cached for queries that are missing or incomplete:
+NOQUERY = False
+
+ROUNDING_FUNCTIONS = {
+    'round': round,
+    'ceiling': math.ceil,
+    'floor': math.floor,
+    }
+
+
+def split_path(path):
+    """Split flex form field path into (fieldset name, field name)"""
+    spec = path.split('/')
+    fieldset = spec[0] if len(spec) > 1 else ''
+    name = spec[1] if len(spec) > 1 else path
+    return (fieldset, name)
+
+
+class EvaluationPlan(object):
+    """
+    Immutable, pre-resolved evaluation settings for a measure: source
+    type dispatch, numerator/denominator types, split flex field paths,
+    rounding function, multiplier, and display format template.  Plans
+    hold no references to content, so they may be shared by threads and
+    connections, and are cached by plan_for().
+    """
+
+    def __init__(self, measure, source_type):
+        _get = lambda name, default=None: getattr(measure, name, default)
+        self.source_type = source_type
+        self.multi = source_type == MULTI_FORM_TYPE
+        self.numerator_type = _get('numerator_type')
+        self.denominator_type = _get('denominator_type')
+        self.summarized = tuple(
+            name for name in ('numerator', 'denominator')
+            if _get('%s_type' % name) == 'multi_summarize'
+            )
+        self.ratio = self.multi and self.denominator_type != 'constant'
+        _split = lambda p: split_path(p) if p else None
+        self.numerator_field = _split(_get('numerator_field') or None)
+        self.denominator_field = _split(_get('denominator_field') or None)
+        self.notes_field = _split(_get('notes_field') or None)
+        self.multiplier = _get('multiplier', 1.0)
+        rrule = _get('rounding')
+        self.rounding = ROUNDING_FUNCTIONS.get(rrule, round) if rrule else None
+        self.whole = (
+            self.numerator_type != 'multi_summarize' and
+            _get('value_type') == 'count'
+            )
+        fmt = '%%.%if' % _get('display_precision')
+        if _get('value_type') == 'percentage' and self.multiplier == 100.0:
+            fmt += '%%'
+        self.template = fmt
+
+    def normalize(self, v):
+        """Apply multiplier, rounding, and count (int) rules to value"""
+        if math.isnan(v):
+            return v
+        v = self.multiplier * v  # multiplier defaults to 1.0
+        if self.rounding is not None:
+            v = self.rounding(v)
+        if self.whole:
+            return int(v)  # count is always whole numbers
+        return v  # floating point value, normalized
+
+    def format(self, value):
+        if math.isnan(value):
+            return 'N/A'
+        return self.template % value
+
+
+def plan_key(measure, source_type):
+    definition = measure.form_definition()
+    return (
+        IUUID(measure, None),
+        str(measure.modified()),
+        getattr(definition, 'signature', None),
+        source_type,
+        )
+
+
+def plan_for(measure):
+    """
+    Get (cached, or newly compiled) evaluation plan for measure, keyed
+    by measure UID and modification time, signature of the bound form
+    definition, and source type of the measure group.
+    """
+    source_type = measure.group().source_type
+    key = plan_key(measure, source_type)
+    plan = PLAN_CACHE.get(key)
+    if plan is None:
+        plan = EvaluationPlan(measure, source_type)
+        PLAN_CACHE.put(key, plan)
+    return plan
+
+
+def query_key(measure, name):
+    definition = measure.form_definition()
+    return (
+        IUUID(measure, None),
+        str(measure.modified()),
+        getattr(definition, 'signature', None),
+        name,
+        )
+
+
+def query_for(measure, name, complete=None):
+    """
+    Get (cached, or newly built) repoze.catalog query for the composed
+    query of measure by name (numerator, denominator), or None if there
+    is no such query or it is incomplete (per complete, a predicate).
+    Queries are cached per process, keyed by measure UID, modification
+    time, signature of the bound form definition, and query name.
+    """
+    key = query_key(measure, name)
+    q = QUERY_CACHE.get(key)
+    if q is None:
+        composed = queryAdapter(measure, IComposedQuery, name=name)
+        q = NOQUERY
+        if IComposedQuery.providedBy(composed):
+            built = composed.build(measure.form_definition().schema)
+            if complete is None or complete(built):
+                # copy, detaching any persistent values from connection:
+                q = deepcopy(built)
+        QUERY_CACHE.put(key, q)
+    return q if q is not NOQUERY else None
@@ -0,0 +1,109 @@
+"""
+Opt-in instrumentation of measure computation: per-phase counters and
+timers, collected per request.  Enabled for every request by setting
+UU_FORMLIBRARY_PROFILE in the environment, or for one request by the
+request flag uu_formlibrary_profile=1 (see also @@measure_profile).
+"""
+
+from contextlib import contextmanager
+import json
+import time
+
+from zope.annotation.interfaces import IAnnotations
+from zope.globalrequest import getRequest
+
+from uu.formlibrary import product_log
+from uu.formlibrary.utils import env_flag
+
+
+PROFILE_ENABLED = env_flag('UU_FORMLIBRARY_PROFILE')
+
+REQUEST_FLAG = 'uu_formlibrary_profile'
+
+ANNO_KEY = 'uu.formlibrary.profile'
+
+
+class Profile(object):
+    """Counters (name -> count) and timers (name -> calls, seconds)"""
+
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        calls, total = self.timers.get(name, (0, 0.0))
+        self.timers[name] = (calls + 1, total + seconds)
+
+    def report(self):
+        return {
+            'elapsed': time.time() - self.started,
+            'counters': dict(self.counters),
+            'timers': dict(
+                (name, {'calls': calls, 'seconds': seconds})
+                for name, (calls, seconds) in self.timers.items()
+                ),
+            }
+
+    def log(self, label):
+        product_log.info(
+            'Measure profile for %s: %s' % (label, json.dumps(self.report()))
+            )
+
+
+def _state(request):
+    """
+    Mapping holding per-request profile state: request.other (a plain
+    dict) for Zope 2 requests, avoiding an adapter lookup on every
+    count() or timed() call, otherwise annotations of request.
+    """
+    other = getattr(request, 'other', None)
+    if isinstance(other, dict):
+        return other
+    return IAnnotations(request)
+
+
+def enable(request):
+    """Enable profiling for remainder of request, return Profile"""
+    state = _state(request)
+    profile = state.get(ANNO_KEY)
+    if not profile:
+        profile = state[ANNO_KEY] = Profile()
+    return profile
+
+
+def current(request=None):
+    """Profile for current request, or None if profiling is not enabled"""
+    request = request if request is not None else getRequest()
+    if request is None:
+        return None
+    state = _state(request)
+    profile = state.get(ANNO_KEY, None)
+    if profile is None:
+        # decided once per request; False (off) is cached as well:
+        enabled = PROFILE_ENABLED or request.get(REQUEST_FLAG, None)
+        profile = state[ANNO_KEY] = Profile() if enabled else False
+    return profile or None
+
+
+def count(name, n=1):
+    profile = current()
+    if profile is not None:
+        profile.count(name, n)
+
+
+@contextmanager
+def timed(name):
+    """Context manager timing a phase, when profiling is enabled"""
+    profile = current()
+    if profile is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        profile.add_time(name, time.time() - start)
@@ -2,10 +2,11 @@ import hashlib
 import hmac
 import base64
 import pickle
-from Products.CMFCore.utils import getToolByName
 from Products.ZCatalog.CatalogBrains import AbstractCatalogBrain
 from plone.app.layout.navigation.root import getNavigationRoot
-from zope.component.hooks import getSite
+
+from uu.formlibrary.utils import resolve_uids
+import profiling
 
 
 class SignedDataStreamCodec(object):
@@ -89,17 +90,17 @@ def uid_get(uid, site=None):
     """
     Unlike implementation of plone.app.uuid.utils.uuidToObject(),
     this function does not do permissions checks to obtain object.
+    Lookups are memoized for the remainder of any current request.
     """
-    site = site or getSite()
-    catalog = getToolByName(site, 'portal_catalog')
-    r = catalog.unrestrictedSearchResults({'UID': uid})
-    return r[0]._unrestrictedGetObject() if r else None
+    return resolve_uids([uid], site, memo=True).get(str(uid))
 
 
 def get(spec, site=None):
     """Get object, given brain or UID"""
     if isbrain(spec):
-        return spec._unrestrictedGetObject()
+        profiling.count('objects.loaded')
+        with profiling.timed('objects.load'):
+            return spec._unrestrictedGetObject()
     return uid_get(str(spec), site)
 
 
@@ -1,18 +1,29 @@
+import csv
+from datetime import datetime
+import json
+from StringIO import StringIO
+
 from Acquisition import aq_parent, aq_inner
 from OFS.event import ObjectClonedEvent
 from plone.app.content.namechooser import NormalizingNameChooser
 from plone.app.uuid.utils import uuidToCatalogBrain
 from Products.CMFCore.utils import getToolByName
 from Products.statusmessages.interfaces import IStatusMessage
+import transaction
 from zope.component import getMultiAdapter
 from zope.event import notify
 from zope.lifecycleevent import ObjectCopiedEvent
 from zope.schema import getFieldNamesInOrder
 
 from uu.formlibrary.interfaces import IFormDefinition
+from cache import DataPointCache, DATAPOINT_LRU
 from interfaces import IMeasureDefinition
 from interfaces import MEASURE_DEFINITION_TYPE, GROUP_TYPE, DATASET_TYPE
 from interfaces import AGGREGATE_LABELS
+from interfaces import AGGREGATE_GRANULARITY_CHOICES
+from parallel import parallel_dataset_points
+from plan import PLAN_CACHE, QUERY_CACHE
+import profiling
 
 
 def local_query(context, query, depth=2):
@@ -78,7 +89,12 @@ class FormDataSetView(object):
 
     def aggregate_label(self):
         fn = getattr(self.context, 'aggregate_function', 'AVG')
-        return dict(AGGREGATE_LABELS).get(fn)  # get function label
+        label = dict(AGGREGATE_LABELS).get(fn)  # get function label
+        granularity = getattr(self.context, 'aggregate_granularity', '')
+        if granularity:
+            term = AGGREGATE_GRANULARITY_CHOICES.getTerm(granularity)
+            label = u'%s by %s' % (label, term.title.lower())
+        return label
 
     def dataset_info(self, uid):
         return uuidToCatalogBrain(uid)
@@ -211,9 +227,45 @@ class MeasureDataView(MeasureBaseView):
 
     def update(self, *args, **kwargs):
         self.datasets = self._datasets()
-        for dataset in self.datasets:
-            dsid = dataset.getId()
-            self.datapoints[dsid] = self.context.dataset_points(dataset)
+        profile = profiling.current(self.request)
+        workers = 1 if profile is not None else None  # profile in-thread
+        # serial, or concurrent if UU_FORMLIBRARY_PARALLEL_DATASETS > 1:
+        results = parallel_dataset_points(
+            self.context,
+            self.datasets,
+            workers,
+            )
+        for dataset, points in zip(self.datasets, results):
+            self.datapoints[dataset.getId()] = points
+        if profile is not None:
+            profile.log('/'.join(self.context.getPhysicalPath()))
+
+
+class MeasureProfileView(MeasureDataView):
+    """
+    JSON debug view: computes points for all data sets of a measure
+    with profiling enabled, returns per-phase counters and timers, and
+    statistics of process-wide caches.
+    """
+
+    def __call__(self, *args, **kwargs):
+        profile = profiling.enable(self.request)
+        self.update(*args, **kwargs)
+        report = profile.report()
+        report['datasets'] = dict(
+            (dsid, len(points)) for dsid, points in self.datapoints.items()
+            )
+        # process-wide caches (counters since process start):
+        report['caches'] = {
+            'datapoints': DATAPOINT_LRU.stats(),
+            'plans': PLAN_CACHE.stats(),
+            'queries': QUERY_CACHE.stats(),
+            }
+        data = json.dumps(report, indent=2, sort_keys=True)
+        setHeader = self.request.response.setHeader
+        setHeader('Content-type', 'application/json')
+        setHeader('Content-length', len(data))
+        return data
 
 
 class AllMeasuresView(object):
@@ -258,3 +310,129 @@ class AllMeasuresView(object):
         self.update(*args, **kwargs)
         return self.index(*args, **kwargs)
 
+
+class DataPointQueueView(object):
+    """
+    Site view draining the deferred data point reload queue, suitable
+    for periodic invocation by a ZServer clock-server.
+    """
+
+    def __init__(self, context, request):
+        self.context = context
+        self.request = request
+
+    def _commit(self, site, msg):
+        # commit each batch, so that a conflict spoils only one batch:
+        txn = transaction.get()
+        txn.note('%s -- for %s' % (msg, '/'.join(site.getPhysicalPath())))
+        txn.commit()
+
+    def __call__(self, *args, **kwargs):
+        cache = DataPointCache(self.context)
+        count = cache.process_queue(commit=self._commit)
+        self.request.response.setHeader('Content-Type', 'text/plain')
+        return 'Reloaded data points for %s queued items.' % count
+
+
+class MeasureDataStreamView(MeasureBaseView):
+    """
+    Streaming export of data points of a measure, for all data sets in
+    its group, one point per line, written as each data set is computed
+    (or read from cache), in NDJSON (default) or CSV (format=csv).
+    Optional since and until query parameters (YYYY-MM-DD) limit points
+    by start date, inclusive.
+    """
+
+    BATCH_SIZE = 50
+
+    COLUMNS = (
+        'dataset',
+        'title',
+        'url',
+        'path',
+        'start',
+        'value',
+        'raw_value',
+        'display_value',
+        'raw_numerator',
+        'raw_denominator',
+        'user_notes',
+        )
+
+    def _date(self, name):
+        v = self.request.form.get(name, '').strip()
+        if not v:
+            return None
+        return datetime.strptime(v, '%Y-%m-%d').date()
+
+    def _dataset_points(self, dataset):
+        """
+        Points for dataset, computed in batches when possible; as for
+        measure.dataset_points(), a broken measure or data set yields no
+        points for the data set, rather than failing mid-stream.
+        """
+        measure = self.context
+        window = {'start': self.since, 'end': self.until}
+        if (getattr(dataset, 'use_aggregate', False) or
+                getattr(measure, 'cumulative', None)):
+            # whole-series computation (aggregate, cumulative):
+            return measure.dataset_points(dataset, **window)
+        points = []
+        try:
+            brains = list(dataset.brains(**window))
+            for idx in range(0, len(brains), self.BATCH_SIZE):
+                batch = brains[idx:idx + self.BATCH_SIZE]
+                points.extend(measure.points(batch))
+        except KeyError:
+            # usually this is due to broken measure definition/query
+            return []
+        return points
+
+    def _record(self, dataset, point):
+        _value = lambda v: None if isinstance(v, float) and v != v else v
+        record = dict((k, _value(point.get(k))) for k in self.COLUMNS)
+        record['dataset'] = dataset.getId()
+        start = record['start']
+        record['start'] = start.isoformat() if start is not None else None
+        return record
+
+    def _ndjson_line(self, record):
+        return json.dumps(record) + '\n'
+
+    def _csv_line(self, record):
+        out = StringIO()
+        _str = lambda v: v.encode('utf-8') if isinstance(v, unicode) else v
+        writer = csv.writer(out)
+        writer.writerow([
+            _str(record[k]) if record[k] is not None else ''
+            for k in self.COLUMNS
+            ])
+        return out.getvalue()
+
+    def __call__(self, *args, **kwargs):
+        response = self.request.response
+        try:
+            self.since, self.until = self._date('since'), self._date('until')
+        except ValueError:
+            response.setStatus(400)
+            response.setHeader('Content-Type', 'text/plain')
+            return 'Dates for since, until must be in YYYY-MM-DD format.'
+        csv_output = self.request.form.get('format', '') == 'csv'
+        line = self._csv_line if csv_output else self._ndjson_line
+        ext = 'csv' if csv_output else 'ndjson'
+        filename = '%s.%s' % (self.context.getId(), ext)
+        response.setHeader(
+            'Content-Type',
+            'text/csv' if csv_output else 'application/x-ndjson',
+            )
+        response.setHeader(
+            'Content-Disposition',
+            'attachment; filename=%s' % filename,
+            )
+        # no Content-Length: ZServer uses chunked transfer for HTTP/1.1
+        if csv_output:
+            response.write(','.join(self.COLUMNS) + '\n')
+        for dataset in self._datasets():
+            for point in self._dataset_points(dataset):
+                response.write(line(self._record(dataset, point)))
+        return ''
@@ -0,0 +1,53 @@
+"""
+datapoint_cache_gc.py -- garbage-collect orphaned and superseded keys
+                         in the persistent data point cache of each site.
+
+USE this as a runscript via ./bin/instance run ...
+"""
+
+from AccessControl.SecurityManagement import newSecurityManager
+import transaction
+from zope.component.hooks import setSite
+
+from uu.formlibrary.measure.cache import DataPointCache
+
+PKGNAME = 'uu.formlibrary'
+VHOSTBASE = '/VirtualHostBase/https/teamspace1.upiq.org'
+
+
+_installed = lambda site: site.portal_quickinstaller.isProductInstalled
+product_installed = lambda site, name: _installed(site)(name)
+
+
+def compact_dp_cache(site):
+    cache = DataPointCache(site)
+    before = len(cache)
+    stats = cache.compact()
+    print '\t-- Removed %s of %s cached points (~%s bytes).' % (
+        stats['entries'],
+        before,
+        stats['bytes'],
+        )
+    print '\t-- Pruned %s stale key references from UID index.' % (
+        stats['index_entries'],
+        )
+    return stats
+
+
+def main(app):
+    user = app.acl_users.getUser('admin')
+    newSecurityManager(None, user)
+    for site in app.objectValues('Plone Site'):
+        print '== SITE: %s ==' % site.getId()
+        setSite(site)
+        if not product_installed(site, PKGNAME):
+            continue
+        compact_dp_cache(site)
+        txn = transaction.get()
+        txn.note('%s%s' % (VHOSTBASE, '/'.join(site.getPhysicalPath())))
+        txn.note('Garbage-collected stale data point cache entries')
+        txn.commit()
+
+
+if __name__ == '__main__' and 'app' in locals():
+    main(app)  # noqa
@@ -1,3 +1,5 @@
+import sys
+
 from AccessControl.SecurityManagement import newSecurityManager
 from Acquisition import aq_base
 import transaction
@@ -18,6 +20,12 @@ SITES = {
     'maine': 'https://teamspace.mainequalitycounts.org',
     }
 
+# incremental warming commits a checkpoint after each batch of points:
+BATCH_SIZE = 200
+
+# pass --full to reload all measures, not just stale points:
+FULL = '--full' in sys.argv
+
 
 def wrap_app_in_request(app):
     """
@@ -40,7 +48,11 @@ def use_admin_user(app):
 
 def reload_dp_cache(site):
     cache = DataPointCache(site)
-    cache.warm()
+    if FULL:
+        cache.warm()
+        return
+    stored = cache.warm_incremental(BATCH_SIZE, commit=checkpoint_commit)
+    print '\t %s stale points stored.' % stored
 
 def clear_request(app):
     base = aq_base(app)
@@ -61,6 +73,12 @@ def commit(context, msg):
     txn.commit()  # TODO: uncomment after testing, development
 
 
+def checkpoint_commit(context, msg):
+    clear_request(context.getPhysicalRoot())  # do not persist ref to request
+    commit(context, msg)
+    print '\t checkpoint committed.'
+
+
 def main(app):
     use_admin_user(app)
     for name in SITES.keys():
@@ -0,0 +1,91 @@
+"""
+datapoint_cache_worker.py -- worker loop draining the deferred data point
+                             reload queue for each site, used when
+                             UU_FORMLIBRARY_DEFERRED_RELOAD is set.
+
+USE this as a runscript via ./bin/instance run ...
+"""
+
+import sys
+import time
+
+from AccessControl.SecurityManagement import newSecurityManager
+from Acquisition import aq_base
+import transaction
+from ZODB.POSException import ConflictError
+from ZPublisher.BaseRequest import RequestContainer
+from zope.component.hooks import setSite
+
+from uu.formlibrary.measure.cache import DataPointCache
+from uu.formlibrary.tests import test_request
+
+PKGNAME = 'uu.formlibrary'
+BASE_HOST = 'teamspace1.upiq.org'
+
+# UIDs reloaded per committed batch:
+BATCH_SIZE = 20
+
+# seconds to wait between polling all sites; pass --once to drain, exit:
+INTERVAL = 30
+ONCE = '--once' in sys.argv
+
+
+_installed = lambda site: site.portal_quickinstaller.isProductInstalled
+product_installed = lambda site, name: _installed(site)(name)
+
+
+def wrap_app_in_request(app):
+    request = test_request()
+    request.setServerURL(protocol='http', hostname=BASE_HOST)
+    app = app.__of__(RequestContainer(REQUEST=request))
+    app.REQUEST = request
+    return app, request
+
+
+def clear_request(app):
+    base = aq_base(app)
+    if hasattr(base, 'REQUEST'):
+        delattr(base, 'REQUEST')
+
+
+def commit(context, msg):
+    clear_request(context.getPhysicalRoot())  # do not persist ref to request
+    txn = transaction.get()
+    txn.note('%s -- for %s' % (msg, '/'.join(context.getPhysicalPath())))
+    txn.commit()
+
+
+def drain(site):
+    try:
+        count = DataPointCache(site).process_queue(BATCH_SIZE, commit=commit)
+    except ConflictError:
+        transaction.abort()
+        print '\tConflict processing queue for %s, will retry.' % (
+            site.getId(),
+            )
+        return 0
+    if count:
+        print '\tReloaded %s queued items for %s' % (count, site.getId())
+    return count
+
+
+def main(app):
+    user = app.acl_users.getUser('admin')
+    newSecurityManager(None, user)
+    while True:
+        app._p_jar.sync()  # see queue entries committed by other clients
+        wrapped, request = wrap_app_in_request(app)
+        for site in wrapped.objectValues('Plone Site'):
+            if not product_installed(site, PKGNAME):
+                continue
+            setSite(site)
+            drain(site)
+        clear_request(wrapped)
+        transaction.abort()
+        if ONCE:
+            break
+        time.sleep(INTERVAL)
+
+
+if __name__ == '__main__' and 'app' in locals():
+    main(app)  # noqa
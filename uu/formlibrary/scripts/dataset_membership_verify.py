@@ -0,0 +1,101 @@
+"""
+dataset_membership_verify.py -- compare materialized membership of each
+                                data set with its live catalog query,
+                                reporting (and optionally repairing) any
+                                difference.
+
+USE this as a runscript via ./bin/instance run ...
+
+Pass --repair to build missing memberships, rebuild memberships that
+differ, and commit.
+"""
+
+import sys
+
+from AccessControl.SecurityManagement import newSecurityManager
+import transaction
+from zope.component.hooks import setSite
+
+from uu.formlibrary.measure.interfaces import DATASET_TYPE
+from uu.formlibrary.measure.membership import registry, rebuild
+from uu.formlibrary.measure.membership import materialized, membership_for
+from uu.formlibrary.measure.utils import get
+
+PKGNAME = 'uu.formlibrary'
+VHOSTBASE = '/VirtualHostBase/https/teamspace1.upiq.org'
+
+
+_installed = lambda site: site.portal_quickinstaller.isProductInstalled
+product_installed = lambda site, name: _installed(site)(name)
+
+
+def verify_site(site, repair=False):
+    """
+    Returns count of data sets with membership differing from query,
+    or without (current) membership.
+    """
+    reg = registry(site) or {}
+    catalog = site.portal_catalog
+    brains = catalog.unrestrictedSearchResults({'portal_type': DATASET_TYPE})
+    datasets = dict((b.UID, b) for b in brains)
+    differing = 0
+    for uid in sorted(set(reg.keys()) - set(datasets)):
+        print '\t-- Orphaned membership for data set %s' % uid
+        if repair:
+            del reg[uid]
+    for uid, brain in sorted(datasets.items()):
+        dataset = get(brain)
+        membership = reg.get(uid)
+        if not materialized(dataset):
+            print '\t-- %s: live query only (title filter)' % dataset.getId()
+            if repair and membership is not None:
+                del reg[uid]
+            continue
+        if membership_for(dataset) is None:
+            differing += 1
+            state = 'missing' if membership is None else 'stale/outdated'
+            print '\t-- %s: membership %s' % (dataset.getId(), state)
+            if repair:
+                rebuild(dataset, site)
+            continue
+        expected = set(b.UID for b in dataset._query_brains())
+        stored = set(membership.uids())
+        if expected == stored:
+            print '\t-- %s: OK (%s forms)' % (dataset.getId(), len(stored))
+            continue
+        differing += 1
+        print '\t-- %s: DIFFERS, %s missing, %s extra' % (
+            dataset.getId(),
+            len(expected - stored),
+            len(stored - expected),
+            )
+        for form_uid in sorted(expected - stored):
+            print '\t\t missing: %s' % form_uid
+        for form_uid in sorted(stored - expected):
+            print '\t\t extra: %s' % form_uid
+        if repair:
+            rebuild(dataset, site)
+    return differing
+
+
+def main(app):
+    repair = '--repair' in sys.argv
+    user = app.acl_users.getUser('admin')
+    newSecurityManager(None, user)
+    differing = 0
+    for site in app.objectValues('Plone Site'):
+        print '== SITE: %s ==' % site.getId()
+        setSite(site)
+        if not product_installed(site, PKGNAME):
+            continue
+        differing += verify_site(site, repair)
+        if repair:
+            txn = transaction.get()
+            txn.note('%s%s' % (VHOSTBASE, '/'.join(site.getPhysicalPath())))
+            txn.note('Repaired materialized data set memberships')
+            txn.commit()
+    print '== %s data set(s) with differing membership' % differing
+
+
+if __name__ == '__main__' and 'app' in locals():
+    main(app)  # noqa
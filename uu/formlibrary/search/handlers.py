@@ -4,7 +4,8 @@ from collective.computedfield.utils import has_computed_fields
 from collective.computedfield.field import complete
 
 from uu.retrieval.catalog import SimpleCatalog
-from uu.formlibrary.measure.cache import DataPointCache
+from uu.formlibrary.measure.cache import reload_or_enqueue
+from uu.formlibrary.snapshot import update_snapshot
 
 
 def index_records(context):
@@ -42,8 +43,10 @@ def handle_multiform_modify(context, event):
         schema = records[0].schema
         if has_computed_fields(schema):
             complete_computed_values(context, schema)
+    # invalidate (or if enabled, rebuild) columnar snapshot of records:
+    update_snapshot(context)
     # reload the data point cache for all points/measures for this form:
-    DataPointCache().reload(IUUID(context))
+    reload_or_enqueue(IUUID(context))
 
 
 def handle_multiform_savedata(context):
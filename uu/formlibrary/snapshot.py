@@ -0,0 +1,145 @@
+# derived columnar snapshot of multi-record form data, for read-mostly use
+
+from array import array
+
+from persistent import Persistent
+from zope.schema import getFieldsInOrder
+from zope.schema.interfaces import IFloat, IInt
+
+from uu.formlibrary.interfaces import IMultiForm
+from uu.formlibrary.utils import env_flag
+
+
+# snapshots are opt-in: UU_FORMLIBRARY_COLUMN_SNAPSHOT=on
+SNAPSHOT_ENABLED = env_flag('UU_FORMLIBRARY_COLUMN_SNAPSHOT')
+
+SNAPSHOT_ATTR = '_column_snapshot'
+SERIAL_ATTR = '_snapshot_serial'
+
+
+def _freeze(v):
+    if isinstance(v, (list, set)):
+        return tuple(v)
+    return v
+
+
+def _typed(field, values):
+    """Compact array for numeric column without missing values, or list"""
+    typecode = None
+    if IInt.providedBy(field):
+        typecode = 'l'
+    if IFloat.providedBy(field):
+        typecode = 'd'
+    if typecode is None or None in values:
+        return values
+    try:
+        return array(typecode, values)
+    except (OverflowError, TypeError):
+        return values
+
+
+class SnapshotRow(object):
+    """
+    Read-only record-like view of one row of a snapshot; field values
+    are attributes, as they are on form entries.
+    """
+
+    __slots__ = ('_snapshot', '_index')
+
+    def __init__(self, snapshot, index):
+        self._snapshot = snapshot
+        self._index = index
+
+    @property
+    def record_uid(self):
+        return self._snapshot.row_ids[self._index]
+
+    def __getattr__(self, name):
+        column = self._snapshot.columns.get(name)
+        if column is None:
+            raise AttributeError(name)
+        return column[self._index]
+
+
+class ColumnSnapshot(Persistent):
+    """
+    Columnar copy of the records of a multi-record form: row_ids is a
+    list of record UIDs (in form order), columns is a dict of field
+    name to a typed array (numeric fields without missing values) or a
+    list of values, each in row order.  The serial is the value of the
+    form's modification counter when the snapshot was built.
+    """
+
+    def __init__(self, serial, row_ids, columns):
+        self.serial = serial
+        self.row_ids = row_ids
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def column(self, name):
+        return self.columns.get(name)
+
+    def rows(self):
+        return [SnapshotRow(self, idx) for idx in range(len(self))]
+
+
+def serial(form):
+    return getattr(form, SERIAL_ATTR, 0)
+
+
+def bump_serial(form):
+    """Mark form data as modified, invalidating any snapshot"""
+    setattr(form, SERIAL_ATTR, serial(form) + 1)
+
+
+def build_snapshot(form):
+    """Build snapshot from records of form, in one pass over records"""
+    fields = getFieldsInOrder(form.schema)
+    row_ids = []
+    columns = dict((name, []) for name, field in fields)
+    appenders = [(name, columns[name].append) for name, field in fields]
+    for record in form.values():
+        row_ids.append(record.record_uid)
+        for name, append in appenders:
+            append(_freeze(getattr(record, name, None)))
+    for name, field in fields:
+        columns[name] = _typed(field, columns[name])
+    return ColumnSnapshot(serial(form), row_ids, columns)
+
+
+def update_snapshot(form):
+    """
+    Called when form data is saved: invalidate any snapshot, and when
+    snapshots are enabled, store a newly built snapshot on the form.
+    """
+    bump_serial(form)
+    if SNAPSHOT_ENABLED and IMultiForm.providedBy(form):
+        setattr(form, SNAPSHOT_ATTR, build_snapshot(form))
+
+
+def snapshot(form):
+    """
+    Get current snapshot for a multi-record form, as built when form
+    data was last saved (never built on read, to avoid writes in read
+    requests).  Returns None if snapshots are not enabled, form is not a
+    multi-record form, or there is no current snapshot.
+    """
+    if not SNAPSHOT_ENABLED or not IMultiForm.providedBy(form):
+        return None
+    current = getattr(form, SNAPSHOT_ATTR, None)
+    if current is None or current.serial != serial(form):
+        return None
+    return current
+
+
+def record_values(form):
+    """
+    Records of form for read-only use: snapshot rows when available,
+    otherwise the (persistent) form entries themselves.
+    """
+    current = snapshot(form)
+    if current is None:
+        return form.values()
+    return current.rows()
@@ -2,6 +2,8 @@
 # one or more test cases, for all else, build your common fixtures in the
 # layer(s) (see layers.py), not the test cases.
 
+from datetime import date, timedelta
+import json
 import os
 
 from plone.uuid.interfaces import IUUID
@@ -144,3 +146,127 @@ class CreateContentFixtures(object):
         ## finally mark, don't build fixtures more than once
         self.fixtures_completed = True  # run once
 
+
+
+class SyntheticSiteFixtures(CreateContentFixtures):
+    """
+    Builds a synthetic site for benchmarking: N form definitions (each
+    using the chart-audit schema), M multi-record forms of R records for
+    each definition, and K measures (in a measure group, with one data
+    set including all forms) for each definition.
+
+    self.context is TestCase (for assertions by _add_check()).
+    self.portal is portal, set from layer.
+
+    After create(), attributes definitions, forms, measures, and datasets
+    are lists of the constructed content.
+    """
+
+    ENTRY = {
+        'referral_type': u'Phone',
+        'specific_concern': u'Yes',
+        'history': u'Yes',
+        }
+
+    def __init__(self, context, layer, definitions=2, forms=10, records=50,
+                 measures=4):
+        super(SyntheticSiteFixtures, self).__init__(context, layer)
+        self.counts = {
+            'definitions': definitions,
+            'forms': forms,
+            'records': records,
+            'measures': measures,
+            }
+        self.definitions = []
+        self.forms = []
+        self.measures = []
+        self.datasets = []
+
+    def _records_json(self, count):
+        return json.dumps({
+            'notes': 'synthetic',
+            'entries': [dict(self.ENTRY) for i in range(count)],
+            })
+
+    def create(self):
+        from uu.formlibrary import interfaces, library, definition, series
+        from uu.formlibrary import forms as formtypes
+        from uu.formlibrary.measure import content as measures
+        from uu.formlibrary.measure import interfaces as minterfaces
+        counts = self.counts
+        lib = self._add_check(
+            typename=interfaces.LIBRARY_TYPE,
+            id='bench_formlib',
+            iface=interfaces.IFormLibrary,
+            cls=library.FormLibrary,
+            )
+        mlib = self._add_check(
+            typename='uu.formlibrary.measurelibrary',
+            id='bench_measures',
+            iface=minterfaces.IMeasureLibrary,
+            cls=measures.MeasureLibrary,
+            )
+        for i in range(counts['definitions']):
+            defn = self._add_check(
+                typename=interfaces.DEFINITION_TYPE,
+                id='bench_defn_%s' % i,
+                iface=interfaces.IFormDefinition,
+                cls=definition.FormDefinition,
+                parent=lib,
+                )
+            defn.entry_schema = CHART_AUDIT_SCHEMA
+            notify(ObjectModifiedEvent(defn))
+            self.definitions.append(defn)
+            form_series = self._add_check(
+                typename=interfaces.SERIES_TYPE,
+                id='bench_series_%s' % i,
+                iface=interfaces.IFormSeries,
+                cls=series.FormSeries,
+                )
+            for j in range(counts['forms']):
+                form = self._add_check(
+                    typename=interfaces.MULTI_FORM_TYPE,
+                    id='bench_form_%s' % j,
+                    iface=interfaces.IMultiForm,
+                    cls=formtypes.MultiForm,
+                    parent=form_series,
+                    )
+                form.definition = IUUID(defn)
+                form.start = date(2014, 1, 1) + timedelta(days=7 * j)
+                form.update_all(self._records_json(counts['records']))
+                notify(ObjectModifiedEvent(form))
+                self.forms.append(form)
+            group = self._add_check(
+                typename=minterfaces.GROUP_TYPE,
+                id='bench_group_%s' % i,
+                iface=minterfaces.IMeasureGroup,
+                cls=measures.MeasureGroup,
+                parent=mlib,
+                )
+            group.definition = IUUID(defn)
+            group.source_type = interfaces.MULTI_FORM_TYPE
+            for k in range(counts['measures']):
+                measure = self._add_check(
+                    typename=minterfaces.MEASURE_DEFINITION_TYPE,
+                    id='bench_measure_%s' % k,
+                    iface=minterfaces.IMeasureDefinition,
+                    cls=measures.MeasureDefinition,
+                    parent=group,
+                    )
+                measure.numerator_type = 'multi_total'
+                measure.denominator_type = 'constant'
+                measure.value_type = 'count'
+                measure.multiplier = 1.0
+                measure.display_precision = 1
+                notify(ObjectModifiedEvent(measure))
+                self.measures.append(measure)
+            dataset = self._add_check(
+                typename=minterfaces.DATASET_TYPE,
+                id='bench_dataset',
+                iface=minterfaces.IFormDataSetSpecification,
+                cls=measures.FormDataSetSpecification,
+                parent=group,
+                )
+            dataset.locations = [IUUID(form_series)]
+            dataset.sort_on_start = True
+            self.datasets.append(dataset)
@@ -0,0 +1,108 @@
+from datetime import date
+
+import unittest2 as unittest
+
+from uu.formlibrary.measure.aggregate import running, group_points
+from uu.formlibrary.measure.interfaces import AGGREGATE_FUNCTIONS
+
+
+SERIES = [3, 1, 4, 1, 5, 9, 2, 6]
+
+
+def _same(a, b):
+    """Equal values, treating NaN as equal to NaN"""
+    if a != a and b != b:
+        return True
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) < 1e-9
+    return a == b
+
+
+class RunningAggregateTest(unittest.TestCase):
+    """Test running (prefix) aggregates against AGGREGATE_FUNCTIONS"""
+
+    def assertSameValues(self, result, expected, name):
+        self.assertEqual(len(result), len(expected))
+        for idx, (a, b) in enumerate(zip(result, expected)):
+            self.assertTrue(
+                _same(a, b),
+                '%s prefix %s: %r != %r' % (name, idx, a, b),
+                )
+
+    def test_prefix_equivalence(self):
+        for name, fn in AGGREGATE_FUNCTIONS.items():
+            expected = [fn(SERIES[:i + 1]) for i in range(len(SERIES))]
+            self.assertSameValues(running(SERIES, name), expected, name)
+
+    def test_float_values(self):
+        values = [2.5, 0.5, 4.0, 1.25]
+        for name, fn in AGGREGATE_FUNCTIONS.items():
+            expected = [fn(values[:i + 1]) for i in range(len(values))]
+            self.assertSameValues(running(values, name), expected, name)
+
+    def test_skips_missing(self):
+        nan = float('nan')
+        values = [None, 2, nan, 3, None]
+        present = [[], [2], [2], [2, 3], [2, 3]]
+        for name in ('SUM', 'COUNT', 'AVG', 'MEDIAN', 'MAX', 'LAST'):
+            fn = AGGREGATE_FUNCTIONS[name]
+            result = running(values, name)
+            self.assertSameValues(result[1:], map(fn, present[1:]), name)
+        self.assertEqual(running(values, 'SUM')[0], 0)
+        self.assertEqual(running(values, 'COUNT')[0], 0)
+        self.assertTrue(running(values, 'AVG')[0] != running(values, 'AVG')[0])
+        self.assertIsNone(running(values, 'MEDIAN')[0])
+
+    def test_unknown_function(self):
+        self.assertRaises(ValueError, running, SERIES, 'NOPE')
+
+
+class GroupPointsTest(unittest.TestCase):
+    """Test date bucketing of data points"""
+
+    def _points(self):
+        return [
+            {'start': date(2014, 3, 31), 'value': 1.0},
+            {'start': date(2014, 1, 15), 'value': 2.0},
+            {'start': date(2014, 1, 2), 'value': 3.0},
+            {'start': date(2014, 4, 1), 'value': float('nan')},
+            {'start': date(2014, 4, 2), 'value': None},
+            {'start': date(2014, 5, 7), 'value': 4.0},
+            ]
+
+    def test_exact(self):
+        groups = group_points(self._points())
+        self.assertEqual(
+            [d for d, points in groups],
+            [date(2014, 1, 2), date(2014, 1, 15), date(2014, 3, 31),
+             date(2014, 5, 7)],
+            )
+
+    def test_month(self):
+        groups = dict(group_points(self._points(), 'month'))
+        self.assertEqual(
+            sorted(groups.keys()),
+            [date(2014, 1, 1), date(2014, 3, 1), date(2014, 5, 1)],
+            )
+        jan = [p['value'] for p in groups[date(2014, 1, 1)]]
+        self.assertEqual(AGGREGATE_FUNCTIONS['SUM'](jan), 5.0)
+
+    def test_quarter(self):
+        groups = group_points(self._points(), 'quarter')
+        self.assertEqual(
+            [(d, len(points)) for d, points in groups],
+            [(date(2014, 1, 1), 3), (date(2014, 4, 1), 1)],
+            )
+
+    def test_isoweek(self):
+        groups = group_points(self._points(), 'isoweek')
+        starts = [d for d, points in groups]
+        self.assertTrue(all(d.weekday() == 0 for d in starts))
+        self.assertEqual(starts[0], date(2013, 12, 30))
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(RunningAggregateTest),
+        unittest.makeSuite(GroupPointsTest),
+        ])
@@ -0,0 +1,123 @@
+"""
+Benchmarks for measure evaluation, data point cache, and export hot
+paths, run against a synthetic site (see fixtures.SyntheticSiteFixtures).
+
+Skipped unless UU_FORMLIBRARY_BENCHMARK names a path for JSON results,
+which can be compared between commits, e.g.:
+
+  UU_FORMLIBRARY_BENCHMARK=bench.json bin/test -s uu.formlibrary \\
+    -t test_benchmark
+
+Site size is set by UU_FORMLIBRARY_BENCHMARK_SIZE as comma-separated
+counts of definitions, forms (per definition), records (per form), and
+measures (per definition); default is '2,10,50,4'.
+"""
+
+from datetime import datetime
+import json
+import os
+import subprocess
+import time
+import unittest2 as unittest
+from StringIO import StringIO
+
+from plone.app.testing import TEST_USER_ID, setRoles
+
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+OUTPUT = os.environ.get('UU_FORMLIBRARY_BENCHMARK', '').strip()
+SIZE = os.environ.get('UU_FORMLIBRARY_BENCHMARK_SIZE', '2,10,50,4')
+REPEAT = 3
+
+
+def _revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(__file__),
+            ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@unittest.skipUnless(OUTPUT, 'UU_FORMLIBRARY_BENCHMARK not set')
+class BenchmarkTest(unittest.TestCase):
+    """Time hot paths on synthetic site, write JSON results"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    def setUp(self):
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        counts = [int(v) for v in SIZE.split(',')]
+        self.fixtures = SyntheticSiteFixtures(self, self.layer, *counts)
+        self.timings = {}
+
+    def timed(self, name, fn, repeat=REPEAT):
+        """Call fn repeat times, keep min/median/max seconds for name"""
+        runs = []
+        for i in range(repeat):
+            t = time.time()
+            fn()
+            runs.append(time.time() - t)
+        runs.sort()
+        self.timings[name] = {
+            'min': runs[0],
+            'median': runs[len(runs) // 2],
+            'max': runs[-1],
+            'runs': repeat,
+            }
+
+    def test_benchmark(self):
+        from uu.formlibrary.importexport import csv_export
+        from uu.formlibrary.measure.cache import DataPointCache
+        from uu.formlibrary.measure.cache import DATAPOINT_LRU
+        from uu.formlibrary.xls import FormWorkbook
+        fixtures = self.fixtures
+        self.timed('fixtures', fixtures.create, repeat=1)
+        forms, measures = fixtures.forms, fixtures.measures
+        payload = fixtures._records_json(fixtures.counts['records'])
+        self.timed(
+            'multiform_update_all',
+            lambda: [form.update_all(payload) for form in forms],
+            )
+        self.timed(
+            'csv_export',
+            lambda: [csv_export(form) for form in forms],
+            )
+
+        def _workbook():
+            workbook = FormWorkbook(StringIO())
+            for form in forms:
+                workbook.add(form).write()
+        self.timed('workbook_write', _workbook)
+
+        cache = DataPointCache(self.portal)
+        DATAPOINT_LRU.clear()
+        self.timed('cache_warm_cold', cache.warm, repeat=1)
+        self.timed('cache_warm', cache.warm)
+
+        def _points():
+            for measure in measures:
+                dataset = measure.group()['bench_dataset']
+                measure.dataset_points(dataset)
+        DATAPOINT_LRU.clear()
+        self.timed('dataset_points_lru_cold', _points, repeat=1)
+        self.timed('dataset_points', _points)
+        self.assertTrue(all(t['min'] >= 0 for t in self.timings.values()))
+        result = {
+            'revision': _revision(),
+            'created': datetime.now().isoformat(),
+            'size': fixtures.counts,
+            'timings': self.timings,
+            }
+        with open(OUTPUT, 'w') as out:
+            json.dump(result, out, indent=2, sort_keys=True)
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(BenchmarkTest),
+        ])
@@ -0,0 +1,113 @@
+from datetime import date
+
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+
+from uu.formlibrary.measure.cache import pack_point, unpack_point
+from uu.formlibrary.measure.cache import RECORD_FIELDS
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+class PackPointTest(unittest.TestCase):
+    """Test compact datapoint records stored in data point cache"""
+
+    def _point(self, **kwargs):
+        point = {
+            'title': u'Form',
+            'path': '/plone/forms/form',
+            'start': date(2014, 1, 1),
+            'value': 0.5,
+            'raw_value': 0.5,
+            'display_value': u'50%',
+            'user_notes': u'',
+            }
+        point.update(kwargs)
+        return point
+
+    def test_round_trip(self):
+        point = self._point(raw_numerator=1, raw_denominator=2)
+        record = pack_point(point)
+        self.assertIsInstance(record, tuple)
+        self.assertEqual(len(record), len(RECORD_FIELDS))
+        self.assertEqual(unpack_point(record), point)
+
+    def test_optional_fields_omitted(self):
+        point = self._point()
+        unpacked = unpack_point(pack_point(point))
+        self.assertEqual(unpacked, point)
+        self.assertNotIn('raw_numerator', unpacked)
+        self.assertNotIn('raw_denominator', unpacked)
+
+    def test_url_not_stored(self):
+        point = self._point(url='http://example.com/form')
+        self.assertNotIn('url', unpack_point(pack_point(point)))
+
+    def test_legacy_mapping(self):
+        point = self._point(url='http://example.com/form')
+        unpacked = unpack_point(dict(point))
+        self.assertNotIn('url', unpacked)
+        del point['url']
+        self.assertEqual(unpacked, point)
+
+
+class CompactTest(unittest.TestCase):
+    """Test garbage collection of orphaned, superseded cache keys"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    OLD = '2001/01/01 00:00:00 GMT+0'
+    ORPHAN = '0' * 32
+
+    def setUp(self):
+        from uu.formlibrary.measure.cache import DataPointCache
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        fixtures = SyntheticSiteFixtures(
+            self,
+            self.layer,
+            definitions=1,
+            forms=2,
+            records=2,
+            measures=1,
+            )
+        fixtures.create()
+        self.measure = fixtures.measures[0]
+        self.forms = fixtures.forms
+        self.cache = DataPointCache(self.portal)
+        self.cache.reload(IUUID(self.measure))
+
+    def test_compact(self):
+        cache = self.cache
+        muid = IUUID(self.measure)
+        current = sorted(cache.select(muid))
+        self.assertEqual(len(current), len(self.forms))
+        point = cache.get(current[0])
+        form = self.forms[0]
+        fuid, fstamp = IUUID(form), str(form.modified())
+        superseded = (muid, self.OLD, fuid, fstamp)
+        orphaned = (self.ORPHAN, self.OLD, fuid, fstamp)
+        cache.store(superseded, point)
+        cache.store(orphaned, point)
+        dangling = cache._normalize_key((muid, self.OLD, fuid, self.OLD))
+        cache._keyset(fuid).insert(dangling)  # index key not in cache
+        self.assertEqual(len(cache), len(current) + 2)
+        stats = cache.compact()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['index_entries'], 1)
+        self.assertTrue(stats['bytes'] > 0)
+        self.assertEqual(sorted(cache.keys()), current)
+        self.assertEqual(sorted(cache.select(muid)), current)
+        self.assertNotIn(self.ORPHAN, cache._content_keys)
+        self.assertNotIn(dangling, cache._keyset(fuid))
+        # nothing more to collect:
+        self.assertEqual(cache.compact()['entries'], 0)
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(PackPointTest),
+        unittest.makeSuite(CompactTest),
+        ])
@@ -0,0 +1,50 @@
+import unittest2 as unittest
+
+from uu.formlibrary.measure.columnar import summarize
+from uu.formlibrary.measure.interfaces import AGGREGATE_FUNCTIONS
+
+
+def _same(a, b):
+    """Equal values, treating NaN as equal to NaN"""
+    if a != a and b != b:
+        return True
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) < 1e-9
+    return a == b
+
+
+class Record(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class SummarizeTest(unittest.TestCase):
+    """Test columnar summary of records against AGGREGATE_FUNCTIONS"""
+
+    def test_summarize(self):
+        records = [
+            Record(a=1, b=2.5),
+            Record(a=4, b=None),
+            Record(a=2),
+            Record(a=None, b=0.5),
+            ]
+        present = {'a': [1, 4, 2], 'b': [2.5, 0.5]}
+        specs = [
+            (path, name)
+            for path in ('a', 'b')
+            for name in AGGREGATE_FUNCTIONS
+            ]
+        result = summarize(records, specs)
+        for path, name in specs:
+            expected = AGGREGATE_FUNCTIONS[name](present[path])
+            self.assertTrue(
+                _same(result[(path, name)], expected),
+                '%s %s: %r != %r' % (path, name, result[(path, name)],
+                                     expected),
+                )
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(SummarizeTest),
+        ])
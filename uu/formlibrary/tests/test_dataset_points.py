@@ -0,0 +1,188 @@
+from datetime import date
+
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+from zope.event import notify
+from zope.lifecycleevent import ObjectModifiedEvent
+
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+_starts = lambda points: [p['start'] for p in points]
+_uids = lambda brains: [b.UID for b in brains]
+
+
+class DatasetPointsTest(unittest.TestCase):
+    """Test date windows and paging of dataset_points() and brains()"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    FORMS = 8  # weekly, starting 2014-01-01
+
+    def setUp(self):
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        fixtures = SyntheticSiteFixtures(
+            self,
+            self.layer,
+            definitions=1,
+            forms=self.FORMS,
+            records=1,
+            measures=1,
+            )
+        fixtures.create()
+        self.fixtures = fixtures
+        # distinct values: form j has j + 1 records
+        for idx, form in enumerate(fixtures.forms):
+            form.update_all(fixtures._records_json(idx + 1))
+            notify(ObjectModifiedEvent(form))
+        self.measure = fixtures.measures[0]
+        self.dataset = fixtures.datasets[0]
+        self.dataset.query_state = []
+
+    def _points(self, **kwargs):
+        return self.measure.dataset_points(self.dataset, **kwargs)
+
+    def _add_undated_form(self):
+        from uu.formlibrary.interfaces import MULTI_FORM_TYPE
+        series = self.fixtures.forms[0].__parent__
+        series.invokeFactory(MULTI_FORM_TYPE, 'undated')
+        form = series['undated']
+        form.definition = IUUID(self.fixtures.definitions[0])
+        form.update_all(self.fixtures._records_json(2))
+        notify(ObjectModifiedEvent(form))
+        form.reindexObject()
+        return form
+
+    def _full_scan(self, **window):
+        """Brains in order of start, as sorted in Python (previous path)"""
+        return self.dataset._python_sorted(self.dataset._search(**window))
+
+    def test_all_points(self):
+        points = self._points()
+        self.assertEqual(len(points), self.FORMS)
+        self.assertEqual(
+            _starts(points),
+            [form.start for form in self.fixtures.forms],
+            )
+
+    def test_limit_offset(self):
+        full = self._points()
+        self.assertEqual(self._points(limit=3), full[:3])
+        self.assertEqual(self._points(limit=3, offset=2), full[2:5])
+        self.assertEqual(self._points(offset=6), full[6:])
+        self.assertEqual(self._points(limit=3, offset=7), full[7:])
+        self.assertEqual(self._points(limit=3, offset=20), [])
+
+    def test_reverse(self):
+        full = self._points()
+        self.assertEqual(self._points(limit=3, reverse=True), full[-3:])
+        self.assertEqual(
+            self._points(limit=3, offset=2, reverse=True),
+            full[-5:-2],
+            )
+        self.assertEqual(self._points(offset=2, reverse=True), full[:-2])
+        self.assertEqual(self._points(limit=20, reverse=True), full)
+
+    def test_window(self):
+        points = self._points(start=date(2014, 1, 15), end=date(2014, 2, 5))
+        self.assertEqual(
+            _starts(points),
+            [date(2014, 1, 15), date(2014, 1, 22), date(2014, 1, 29),
+             date(2014, 2, 5)],
+            )
+
+    def test_window_narrows_query(self):
+        self.dataset.query_start = date(2014, 1, 22)
+        self.dataset.query_end = date(2014, 2, 12)
+        # window wider than query of data set does not widen it:
+        self.assertEqual(
+            _starts(self._points(start=date(2014, 1, 1))),
+            [date(2014, 1, 22), date(2014, 1, 29), date(2014, 2, 5),
+             date(2014, 2, 12)],
+            )
+        # narrower window narrows query on each side:
+        self.assertEqual(
+            _starts(self._points(
+                start=date(2014, 1, 29),
+                end=date(2014, 2, 5),
+                )),
+            [date(2014, 1, 29), date(2014, 2, 5)],
+            )
+        self.assertEqual(
+            _starts(self._points(limit=1, reverse=True)),
+            [date(2014, 2, 12)],
+            )
+
+    def test_cumulative_window(self):
+        self.measure.cumulative = 'numerator'
+        self.measure.notifyModified()
+        notify(ObjectModifiedEvent(self.measure))
+        full = self._points()
+        values = [p['value'] for p in full]
+        self.assertEqual(values, sorted(values))  # running sum, increasing
+        start = date(2014, 1, 22)
+        # values in window still accumulate points preceding window:
+        expected = [p for p in full if p['start'] >= start]
+        self.assertEqual(self._points(start=start), expected)
+        self.assertEqual(
+            self._points(start=start, limit=2),
+            expected[:2],
+            )
+        self.assertEqual(self._points(limit=2, reverse=True), full[-2:])
+        end = date(2014, 2, 5)
+        self.assertEqual(
+            self._points(start=start, end=end),
+            [p for p in expected if p['start'] <= end],
+            )
+
+    def test_undated_form(self):
+        form = self._add_undated_form()
+        brains = self.dataset.brains()
+        self.assertEqual(len(brains), self.FORMS + 1)
+        ordered = _uids(self._full_scan())
+        self.assertEqual(ordered[0], IUUID(form))  # no start sorts first
+        # sorted catalog results omit undated form, Python sort fallback:
+        self.assertEqual(_uids(self.dataset.brains(limit=3)), ordered[:3])
+        self.assertEqual(
+            _uids(self.dataset.brains(limit=3, offset=1)),
+            ordered[1:4],
+            )
+        full = self._points()
+        self.assertEqual(len(full), self.FORMS + 1)
+        self.assertEqual(full[0]['start'], None)
+        self.assertEqual(self._points(limit=2), full[:2])
+        self.assertEqual(self._points(limit=20, reverse=True), full)
+        # any date window excludes undated form:
+        windowed = self._points(start=date(2014, 1, 1))
+        self.assertEqual(len(windowed), self.FORMS)
+
+    def test_latest_same_as_full_scan(self):
+        self._add_undated_form()
+        windows = [
+            {},
+            {'start': date(2014, 1, 15)},
+            {'end': date(2014, 2, 5)},
+            {'start': date(2014, 1, 15), 'end': date(2014, 2, 5)},
+            ]
+        for window in windows:
+            ordered = _uids(self._full_scan(**window))
+            for n in (1, 3, len(ordered), len(ordered) + 5):
+                for offset in (0, 1, 4):
+                    stop = max(0, len(ordered) - offset)
+                    expected = ordered[max(0, stop - n):stop]
+                    self.assertEqual(
+                        _uids(self.dataset.latest(n, offset=offset, **window)),
+                        expected,
+                        (window, n, offset),
+                        )
+        self.assertEqual(self.dataset.latest(0), [])
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(DatasetPointsTest),
+        ])
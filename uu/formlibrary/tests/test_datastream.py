@@ -0,0 +1,85 @@
+import json
+
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+
+from uu.formlibrary.tests import test_request
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+class MeasureDataStreamViewTest(unittest.TestCase):
+    """Test streaming export of measure data points for all data sets"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    FORMS = 4
+
+    def setUp(self):
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        fixtures = SyntheticSiteFixtures(
+            self,
+            self.layer,
+            definitions=1,
+            forms=self.FORMS,
+            records=3,
+            measures=1,
+            )
+        fixtures.create()
+        self.fixtures = fixtures
+        self.measure = fixtures.measures[0]
+        self.group = self.measure.group()
+
+    def _stream(self, **form):
+        from uu.formlibrary.measure.views import MeasureDataStreamView
+        request = test_request()
+        request.form.update(form)
+        written = []
+        request.response.write = written.append
+        view = MeasureDataStreamView(self.measure, request)
+        self.assertEqual(view(), '')
+        return ''.join(written).splitlines()
+
+    def test_stream(self):
+        lines = self._stream()
+        self.assertEqual(len(lines), self.FORMS)
+        records = [json.loads(line) for line in lines]
+        self.assertTrue(all(r['dataset'] == 'bench_dataset' for r in records))
+        starts = [r['start'] for r in records]
+        self.assertEqual(starts, sorted(starts))
+        expected = self.measure.dataset_points(self.group['bench_dataset'])
+        self.assertEqual(
+            [r['value'] for r in records],
+            [p['value'] for p in expected],
+            )
+
+    def test_stream_csv(self):
+        from uu.formlibrary.measure.views import MeasureDataStreamView
+        lines = self._stream(format='csv')
+        self.assertEqual(lines[0], ','.join(MeasureDataStreamView.COLUMNS))
+        self.assertEqual(len(lines), self.FORMS + 1)
+
+    def test_broken_dataset(self):
+        from uu.formlibrary.measure.interfaces import DATASET_TYPE
+
+        def _broken(*args, **kwargs):
+            raise KeyError('broken')
+
+        self.group.invokeFactory(DATASET_TYPE, 'broken_dataset')
+        broken = self.group['broken_dataset']
+        broken.locations = [IUUID(self.fixtures.forms[0].__parent__)]
+        broken.brains = _broken
+        lines = self._stream()
+        # points of the working data set are all written, none for broken:
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), self.FORMS)
+        self.assertTrue(all(r['dataset'] == 'bench_dataset' for r in records))
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(MeasureDataStreamViewTest),
+        ])
@@ -0,0 +1,53 @@
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+import transaction
+
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+class DefinitionIndexTest(unittest.TestCase):
+    """Test maintenance of definition index of measures by events"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    def setUp(self):
+        from uu.formlibrary.interfaces import DEFINITION_TYPE, LIBRARY_TYPE
+        from uu.formlibrary.measure.interfaces import GROUP_TYPE
+        from uu.formlibrary.measure.interfaces import MEASURE_DEFINITION_TYPE
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        self.portal.invokeFactory(LIBRARY_TYPE, 'idx_formlib')
+        library = self.portal['idx_formlib']
+        library.invokeFactory(DEFINITION_TYPE, 'idx_def')
+        self.definition = library['idx_def']
+        self.portal.invokeFactory(
+            'uu.formlibrary.measurelibrary',
+            'idx_measures',
+            )
+        self.measures = self.portal['idx_measures']
+        self.measures.invokeFactory(GROUP_TYPE, 'idx_group')
+        group = self.measures['idx_group']
+        group.definition = IUUID(self.definition)
+        group.invokeFactory(MEASURE_DEFINITION_TYPE, 'idx_measure')
+        self.measure = group['idx_measure']
+
+    def _indexed_measures(self):
+        from uu.formlibrary.measure.cache import DefinitionIndex
+        return DefinitionIndex(self.portal).measures(IUUID(self.definition))
+
+    def test_measure_added(self):
+        self.assertIn(IUUID(self.measure), self._indexed_measures())
+
+    def test_group_moved(self):
+        uid = IUUID(self.measure)
+        transaction.savepoint(optimistic=True)  # for _p_jar, copy support
+        self.measures.manage_renameObject('idx_group', 'idx_group_renamed')
+        self.assertIn(uid, self._indexed_measures())
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(DefinitionIndexTest),
+        ])
@@ -0,0 +1,48 @@
+import unittest2 as unittest
+
+from uu.formlibrary.measure.lru import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """Test bounded in-process LRU cache used by data point cache"""
+
+    def test_get_put(self):
+        cache = LRUCache(maxsize=10)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', (1, 2))
+        self.assertEqual(cache.get('a'), (1, 2))
+        self.assertTrue('a' in cache)
+        self.assertEqual(len(cache), 1)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')  # 'b' is now least recently used
+        cache.put('c', 3)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_byte_budget(self):
+        value = 'x' * 100
+        cache = LRUCache(maxsize=100, maxbytes=250)
+        for i in range(5):
+            cache.put(i, value)
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(cache.bytes <= 250)
+        self.assertEqual(cache.stats()['evictions'], 3)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.bytes, 0)
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(LRUCacheTest),
+        ])
@@ -0,0 +1,170 @@
+from datetime import date
+
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+from zope.event import notify
+from zope.lifecycleevent import Attributes, ObjectModifiedEvent
+
+from uu.formlibrary.interfaces import IFormSeries
+from uu.formlibrary.measure.membership import DatasetMembership, criteria_key
+from uu.formlibrary.measure.membership import materialized, membership_for
+from uu.formlibrary.measure.membership import rebuild, registry
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+class MockDataSet(object):
+
+    locations = ['folder-uid']
+    query_title = None
+    query_subject = []
+    query_start = None
+    query_end = None
+
+    def __init__(self, query_state, query_title=None):
+        self.query_state = query_state
+        self.query_title = query_title
+
+    def _source_type(self):
+        return 'uu.formlibrary.simpleform'
+
+    def resolved_locations(self):
+        return ((), ('/plone/folder',))
+
+
+class MockForm(object):
+
+    portal_type = 'uu.formlibrary.simpleform'
+    start = date(2014, 1, 1)
+
+    def getPhysicalPath(self):
+        return ('', 'plone', 'folder', 'form')
+
+    def Title(self):
+        return u'Form'
+
+    def Subject(self):
+        return ()
+
+
+class DatasetMembershipTest(unittest.TestCase):
+    """Test matching of forms to data set criteria, as in _query_spec()"""
+
+    def _matches(self, query_state, state):
+        membership = DatasetMembership(MockDataSet(query_state))
+        return membership.matches(MockForm(), 'form-uid', state)
+
+    def test_unset_state_excludes_private(self):
+        self.assertFalse(self._matches(None, 'private'))
+        self.assertTrue(self._matches(None, 'published'))
+
+    def test_empty_state_list_includes_any(self):
+        # default of query_state field is [], which does not filter:
+        self.assertTrue(self._matches([], 'private'))
+        self.assertTrue(self._matches([], 'published'))
+
+    def test_states(self):
+        self.assertTrue(self._matches(['private'], 'private'))
+        self.assertFalse(self._matches(['private'], 'published'))
+
+    def test_criteria_key(self):
+        self.assertNotEqual(
+            criteria_key(MockDataSet(None)),
+            criteria_key(MockDataSet([])),
+            )
+
+    def test_outside_locations(self):
+        membership = DatasetMembership(MockDataSet([]))
+        form = MockForm()
+        form.getPhysicalPath = lambda: ('', 'plone', 'other', 'form')
+        self.assertFalse(membership.matches(form, 'form-uid', 'published'))
+
+    def test_title_filter_not_materialized(self):
+        self.assertTrue(materialized(MockDataSet([])))
+        titled = MockDataSet([], query_title=u'Clinic')
+        self.assertFalse(materialized(titled))
+        self.assertIsNone(membership_for(titled))
+
+
+class TitleFilteredDatasetTest(unittest.TestCase):
+    """
+    Test that data sets filtered by title (matching the Title index text
+    of forms, which includes the title of the parent) use live query.
+    """
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    def setUp(self):
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        fixtures = SyntheticSiteFixtures(
+            self,
+            self.layer,
+            definitions=1,
+            forms=3,
+            records=1,
+            measures=1,
+            )
+        fixtures.create()
+        self.forms = fixtures.forms
+        self.series = self.forms[0].__parent__
+        self._retitle(u'Alpha Clinic')
+        self.dataset = fixtures.datasets[0]
+        self.dataset.query_state = []
+
+    def _retitle(self, title):
+        self.series.setTitle(title)
+        notify(ObjectModifiedEvent(
+            self.series,
+            Attributes(IFormSeries, 'title'),
+            ))
+
+    def _uids(self):
+        return set(b.UID for b in self.dataset._query_brains())
+
+    def _registered(self):
+        return IUUID(self.dataset) in (registry(self.portal) or {})
+
+    def test_untitled_materialized(self):
+        membership = rebuild(self.dataset, self.portal)
+        self.assertIsNotNone(membership)
+        self.assertEqual(set(membership.uids()), self._uids())
+        self.assertIs(membership_for(self.dataset), membership)
+
+    def test_parent_title(self):
+        all_forms = set(IUUID(form) for form in self.forms)
+        self.dataset.query_title = u'Alpha'
+        # matches on title of parent, in live query only:
+        self.assertEqual(self._uids(), all_forms)
+        self.assertIsNone(rebuild(self.dataset, self.portal))
+        self.assertIsNone(membership_for(self.dataset))
+        self.assertFalse(self._registered())
+
+    def test_parent_renamed(self):
+        all_forms = set(IUUID(form) for form in self.forms)
+        self.dataset.query_title = u'Alpha'
+        rebuild(self.dataset, self.portal)
+        # renaming parent reindexes forms, without event on forms:
+        self._retitle(u'Beta Clinic')
+        self.assertEqual(self._uids(), set())
+        self.assertIsNone(membership_for(self.dataset))
+        self.dataset.query_title = u'Beta'
+        self.assertEqual(self._uids(), all_forms)
+        self.assertIsNone(membership_for(self.dataset))
+
+    def test_title_filter_added(self):
+        rebuild(self.dataset, self.portal)
+        self.assertTrue(self._registered())
+        self.dataset.query_title = u'Alpha'
+        self.assertIsNone(membership_for(self.dataset))
+        rebuild(self.dataset, self.portal)  # as on modification
+        self.assertFalse(self._registered())
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(DatasetMembershipTest),
+        unittest.makeSuite(TitleFilteredDatasetTest),
+        ])
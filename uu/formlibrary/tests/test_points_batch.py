@@ -0,0 +1,74 @@
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+class PointsBatchTest(unittest.TestCase):
+    """Test batch computation of data points for many forms"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    def setUp(self):
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        fixtures = SyntheticSiteFixtures(
+            self,
+            self.layer,
+            definitions=1,
+            forms=5,
+            records=3,
+            measures=1,
+            )
+        fixtures.create()
+        self.forms = fixtures.forms
+        self.measure = fixtures.measures[0]
+
+    def _clear_cache(self):
+        from uu.formlibrary.measure.cache import DataPointCache
+        from uu.formlibrary.measure.cache import DATAPOINT_LRU
+        cache = DataPointCache(self.portal)
+        for form in self.forms:
+            cache.invalidate(IUUID(form))
+        cache.invalidate(IUUID(self.measure))
+        DATAPOINT_LRU.clear()
+
+    def test_same_as_datapoint(self):
+        self._clear_cache()
+        computed = self.measure.points_batch(self.forms)  # not cached
+        cached = self.measure.points_batch(self.forms)
+        expected = [self.measure.datapoint(form) for form in self.forms]
+        self.assertEqual(computed, expected)
+        self.assertEqual(cached, expected)
+        self.assertEqual(self.measure.points(self.forms), expected)
+
+    def test_uids_and_brains(self):
+        catalog = self.portal.portal_catalog
+        uids = [IUUID(form) for form in self.forms]
+        search = catalog.unrestrictedSearchResults
+        brains = [search({'UID': uid})[0] for uid in uids]
+        expected = [self.measure.datapoint(form) for form in self.forms]
+        self.assertEqual(self.measure.points_batch(uids), expected)
+        self.assertEqual(self.measure.points_batch(brains), expected)
+        mixed = [uids[0], brains[1], self.forms[2]]
+        self.assertEqual(self.measure.points_batch(mixed), expected[:3])
+
+    def test_unresolved_uid_omitted(self):
+        from uu.formlibrary.measure.utils import content_path
+        seq = [IUUID(self.forms[0]), 'no-such-uid', self.forms[1]]
+        points = self.measure.points(seq)
+        self.assertEqual(len(points), 2)
+        self.assertNotIn(None, points)
+        self.assertEqual(
+            [p['path'] for p in points],
+            [content_path(form) for form in self.forms[:2]],
+            )
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(PointsBatchTest),
+        ])
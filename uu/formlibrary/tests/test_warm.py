@@ -0,0 +1,142 @@
+import unittest2 as unittest
+
+from plone.app.testing import TEST_USER_ID, setRoles
+from plone.uuid.interfaces import IUUID
+from zope.event import notify
+from zope.lifecycleevent import ObjectModifiedEvent
+
+from uu.formlibrary.tests.layers import DEFAULT_PROFILE_TESTING
+
+
+class Interrupted(Exception):
+    """Simulated failure of a checkpoint commit"""
+
+
+class WarmIncrementalTest(unittest.TestCase):
+    """Test incremental, resumable warming of data point cache"""
+
+    layer = DEFAULT_PROFILE_TESTING
+
+    FORMS = 2
+    MEASURES = 3
+
+    def setUp(self):
+        from uu.formlibrary.measure.cache import DataPointCache
+        from uu.formlibrary.tests.fixtures import SyntheticSiteFixtures
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        fixtures = SyntheticSiteFixtures(
+            self,
+            self.layer,
+            definitions=2,
+            forms=self.FORMS,
+            records=2,
+            measures=self.MEASURES,
+            )
+        fixtures.create()
+        self.fixtures = fixtures
+        self.cache = DataPointCache(self.portal)
+        for measure in fixtures.measures:
+            self.cache.invalidate(IUUID(measure))
+        self.assertEqual(len(self.cache), 0)
+
+    def _measures(self, definition=0):
+        """Measures of the group for definition, in UID order"""
+        count = self.MEASURES
+        measures = self.fixtures.measures[
+            definition * count:(definition + 1) * count
+            ]
+        return sorted(measures, key=IUUID)
+
+    def _forms(self, definition=0):
+        count = self.FORMS
+        return self.fixtures.forms[definition * count:(definition + 1) * count]
+
+    def _keys(self, measure):
+        return self.cache.select(IUUID(measure))
+
+    def test_full_run(self):
+        from uu.formlibrary.measure.cache import datapoint_cache_key
+        stored = self.cache.warm_incremental()
+        pairs = 2 * self.MEASURES * self.FORMS
+        self.assertEqual(stored, pairs)
+        self.assertEqual(len(self.cache), pairs)
+        for definition in (0, 1):
+            for measure in self._measures(definition):
+                for form in self._forms(definition):
+                    key = datapoint_cache_key(None, measure, form)
+                    self.assertEqual(
+                        self.cache.get(key)['value'],
+                        measure._datapoint(form)['value'],
+                        )
+        state = self.cache._warm_state()
+        self.assertTrue(state['high_water'])
+        self.assertIsNone(state['resume_after'])
+        self.assertIsNone(state['run_started'])
+
+    def test_high_water_mark(self):
+        self.cache.warm_incremental()
+        self.assertEqual(self.cache.warm_incremental(), 0)
+        # missing keys for unchanged content are not considered:
+        form = self._forms()[0]
+        self.cache.invalidate(IUUID(form))
+        self.assertEqual(self.cache.warm_incremental(), 0)
+        self.assertEqual(self.cache.select(IUUID(form)), [])
+        # form modified since high-water mark is:
+        form.notifyModified()
+        form.reindexObject()
+        self.assertEqual(self.cache.warm_incremental(), self.MEASURES)
+        self.assertEqual(len(self.cache.select(IUUID(form))), self.MEASURES)
+
+    def test_resume(self):
+        commits = []
+
+        def commit(site, msg):
+            commits.append(msg)
+            if len(commits) == 2:
+                raise Interrupted()
+
+        measures = self._measures(0) + self._measures(1)
+        measures.sort(key=IUUID)
+        self.assertRaises(
+            Interrupted,
+            self.cache.warm_incremental,
+            batch_size=1,
+            commit=commit,
+            )
+        state = self.cache._warm_state()
+        self.assertEqual(state['resume_after'], IUUID(measures[1]))
+        self.assertIsNone(state.get('high_water'))
+        self.assertTrue(state['run_started'])
+        # resumed run visits only measures after checkpoint:
+        for measure in measures[:2]:
+            self.cache.invalidate(IUUID(measure))
+        stored = self.cache.warm_incremental()
+        self.assertEqual(stored, (len(measures) - 2) * self.FORMS)
+        for measure in measures[:2]:
+            self.assertEqual(self._keys(measure), [])
+        for measure in measures[2:]:
+            self.assertEqual(len(self._keys(measure)), self.FORMS)
+        self.assertIsNone(state['resume_after'])
+        self.assertTrue(state['high_water'])
+
+    def test_group_rebound(self):
+        self.cache.warm_incremental()
+        group = self._measures(0)[0].__parent__
+        group.definition = IUUID(self.fixtures.definitions[1])
+        group.notifyModified()
+        group.reindexObject()
+        notify(ObjectModifiedEvent(group))
+        # measures are not modified, but their group is re-bound:
+        stored = self.cache.warm_incremental()
+        self.assertEqual(stored, self.MEASURES * self.FORMS)
+        new_forms = set(IUUID(form) for form in self._forms(1))
+        for measure in self._measures(0):
+            form_uids = set(key[2] for key in self._keys(measure))
+            self.assertTrue(new_forms <= form_uids)
+
+
+def test_suite():
+    return unittest.TestSuite([
+        unittest.makeSuite(WarmIncrementalTest),
+        ])
@@ -0,0 +1,15 @@
+# upgrade step: data point cache UID-to-keys index, PersistentList->OOTreeSet
+
+from Products.CMFCore.utils import getToolByName
+
+from uu.formlibrary import product_log
+from uu.formlibrary.measure.cache import DataPointCache
+
+
+def upgrade_content_keys(context):
+    """GenericSetup upgrade handler, context is portal_setup tool"""
+    site = getToolByName(context, 'portal_url').getPortalObject()
+    converted = DataPointCache(site).migrate_content_keys()
+    product_log.info(
+        'Converted %s data point cache key lists to OOTreeSet' % converted
+        )
@@ -0,0 +1,15 @@
+# upgrade step: data point cache values, PersistentMapping->record tuples
+
+from Products.CMFCore.utils import getToolByName
+
+from uu.formlibrary import product_log
+from uu.formlibrary.measure.cache import DataPointCache
+
+
+def upgrade_point_records(context):
+    """GenericSetup upgrade handler, context is portal_setup tool"""
+    site = getToolByName(context, 'portal_url').getPortalObject()
+    converted = DataPointCache(site).migrate_records()
+    product_log.info(
+        'Converted %s data point cache values to compact records' % converted
+        )
@@ -0,0 +1,14 @@
+# upgrade step: build definition index of measures and forms, so that the
+# first data point reload after upgrade does not build it in a request
+
+from Products.CMFCore.utils import getToolByName
+
+from uu.formlibrary import product_log
+from uu.formlibrary.measure.cache import DefinitionIndex
+
+
+def build_definition_index(context):
+    """GenericSetup upgrade handler, context is portal_setup tool"""
+    site = getToolByName(context, 'portal_url').getPortalObject()
+    DefinitionIndex(site).rebuild()
+    product_log.info('Built definition index of measures and forms')
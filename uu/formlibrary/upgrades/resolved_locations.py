@@ -0,0 +1,17 @@
+# upgrade step: store resolved locations of data sets, index their paths
+
+from Products.CMFCore.utils import getToolByName
+
+from uu.formlibrary import product_log
+from uu.formlibrary.measure.interfaces import DATASET_TYPE
+
+
+def upgrade_resolved_locations(context):
+    """GenericSetup upgrade handler, context is portal_setup tool"""
+    catalog = getToolByName(context, 'portal_catalog')
+    brains = catalog.unrestrictedSearchResults({'portal_type': DATASET_TYPE})
+    for brain in brains:
+        brain._unrestrictedGetObject().update_resolved_locations()
+    product_log.info(
+        'Stored resolved locations for %s data sets' % len(brains)
+        )
@@ -1,10 +1,15 @@
 import calendar
 from datetime import date, datetime, timedelta
+import os
 import re
 
 from plone.autoform.interfaces import WIDGETS_KEY
 from plone.schemaeditor import schema as se_schema
 from collective.z3cform.datagridfield import DictRow
+from Products.CMFCore.utils import getToolByName
+from zope.annotation.interfaces import IAnnotations
+from zope.component.hooks import getSite
+from zope.globalrequest import getRequest
 from zope.schema import List
 from zope.schema.interfaces import ConstraintNotSatisfied
 
@@ -21,6 +26,12 @@ WIDGET = 'collective.z3cform.datagridfield.datagridfield.DataGridFieldFactory'
 USA_DATE = re.compile('^([01]?[0-9])[/-]([0123]?[0-9])[/-]([0-9]+)$')
 
 
+def env_flag(name):
+    """Is opt-in option named by environment variable on (1/on/true/yes)?"""
+    value = os.environ.get(name, '').strip().lower()
+    return value in ('1', 'on', 'true', 'yes')
+
+
 def grid_wrapper_schema(schema, title=u'', description=u''):
     """
     Given a schema interface for use in a data-grid, construct and
@@ -496,6 +507,54 @@ def local_query(context, query, types=None, depth=2):
     return query
 
 
+def request_memo(name, request=None):
+    """
+    Get (creating, if needed) a dict, stored in request annotations,
+    for memoizing values for the remainder of the current request.
+    Returns None if there is no current request.
+    """
+    request = request if request is not None else getRequest()
+    if request is None:
+        return None
+    key = 'uu.formlibrary.memo.%s' % name
+    anno = IAnnotations(request)
+    if key not in anno:
+        anno[key] = {}
+    return anno.get(key)
+
+
+def resolve_uids(uids, site=None, objects=True, memo=False):
+    """
+    Bulk resolve UIDs to content (or to catalog brains, if objects is
+    False) with a single catalog query for all UIDs.  Unlike
+    plone.app.uuid.utils.uuidToObject(), this does not check
+    permissions.  Returns a dict of UID to object or brain, omitting
+    any UID that cannot be resolved.
+
+    If memo is True, resolved values are memoized for the remainder of
+    the current request, and only UIDs not previously resolved in the
+    request are queried.
+    """
+    uids = set(str(uid) for uid in uids)
+    brains = request_memo('uid_brains') if memo else None
+    brains = brains if brains is not None else {}
+    objs = request_memo('uid_objects') if memo else None
+    objs = objs if objs is not None else {}
+    missing = [uid for uid in uids if uid not in brains]
+    if missing:
+        catalog = getToolByName(site or getSite(), 'portal_catalog')
+        q = {'UID': {'query': missing, 'operator': 'or'}}
+        for brain in catalog.unrestrictedSearchResults(q):
+            brains[brain.UID] = brain
+    found = [uid for uid in uids if uid in brains]
+    if not objects:
+        return dict((uid, brains[uid]) for uid in found)
+    for uid in found:
+        if uid not in objs:
+            objs[uid] = brains[uid]._unrestrictedGetObject()
+    return dict((uid, objs[uid]) for uid in found)
+
+
 def normalize_usa_date(v):
     """
     normalize a date string value of m/d/y form to a datetime.date object.
@@ -13,6 +13,7 @@ from zope.schema.interfaces import ICollection
 from uu.formlibrary.interfaces import IFormDefinition, IFormComponents
 from uu.formlibrary.interfaces import ISimpleForm, IMultiForm
 from uu.formlibrary.importexport import column_spec
+from uu.formlibrary.snapshot import record_values
 from uu.formlibrary import utils
 
 from interfaces import IFormWorkbook, IFlexFormSheet, IFieldsetGrouping
@@ -467,7 +468,7 @@ class MultiRecordFormSheet(BaseFormSheet):
             colidx += 1
         self._cursor += 2  # two rows written above
         # Iterate through records, and write values for each column
-        for record in self.context.values():
+        for record in record_values(self.context):
             self.write_row(self._cursor, record, colspec)
             self._cursor += 1
         # finally, set up freeze panes at row 12: